@@ -0,0 +1,232 @@
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from qdrant_tools.vectordb import QdrantImport, add_update_listener
+
+# Fixed overhead of a cached ScoredPoint, on top of its vector and payload
+POINT_BYTES = 256
+
+
+def estimate_result_bytes(points: Sequence[models.ScoredPoint]) -> int:
+    """
+    Cheaply estimate the memory held by a list of search results.
+
+    Args:
+        points (Sequence[ScoredPoint]): The search results.
+
+    Returns:
+        int: The approximate number of bytes the results occupy.
+    """
+    nbytes = sys.getsizeof(points)
+    for point in points:
+        payload = point.payload or {}
+        vector_bytes = 32 * len(point.vector) if isinstance(point.vector, list) else 0
+        nbytes += POINT_BYTES + vector_bytes + sum(sys.getsizeof(value) for value in payload.values())
+    return nbytes
+
+
+class QueryCache:
+    """
+    LRU cache of Qdrant search results with a time to live and a memory bound.
+
+    Entries are keyed on the collection, the query vector quantized to precision, the filter, the limit and
+    any other search parameters, so repeated queries for (nearly) the same vector are served from memory.
+    Attach the cache to a collection to drop its entries whenever any QdrantImport writes into it.
+
+    Args:
+        max_mb (float): Memory budget of the cached results in MB. Defaults to 64.
+        ttl (Optional[float]): Seconds after which an entry expires. Defaults to 300, None keeps entries
+        until they are evicted or invalidated.
+        precision (float): Quantization step applied to query vectors before hashing. Defaults to 1e-4.
+    """
+
+    def __init__(self, max_mb: float = 64, ttl: Optional[float] = 300, precision: float = 1e-4):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl = ttl
+        self.precision = precision
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.cached_bytes = 0
+        self._entries = OrderedDict()
+        self._generations = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def attach(self, collection: Union[QdrantImport, str]):
+        """
+        Invalidate the cached results of a collection whenever any QdrantImport creates, upserts into or
+        deletes from it, including the imports of DualWriteClient, MigrationPipeline, MigrationScheduler and
+        copy_collection.
+
+        Args:
+            collection (Union[QdrantImport, str]): The cached collection, or an import of it.
+        """
+        collection_name = collection.index_name if isinstance(collection, QdrantImport) else collection
+        add_update_listener(collection_name, self.invalidate)
+
+    def key(
+        self,
+        collection_name: str,
+        vector: Sequence[float],
+        query_filter: Optional[models.Filter],
+        limit: int,
+        **params: Any,
+    ) -> tuple:
+        """
+        Build the cache key of a search.
+
+        Args:
+            collection_name (str): The searched collection.
+            vector (Sequence[float]): The query vector.
+            query_filter (Optional[Filter]): The Qdrant filter of the search.
+            limit (int): The number of results.
+            **params: Any other search parameter changing the results.
+
+        Returns:
+            tuple: The cache key.
+        """
+        quantized = np.round(np.asarray(vector, dtype=np.float64) / self.precision).astype(np.int64)
+        digest = hashlib.blake2b(quantized.tobytes(), digest_size=16)
+        digest.update(query_filter.json(exclude_none=True).encode() if query_filter is not None else b"")
+        digest.update(repr((limit, sorted(params.items()))).encode())
+        return collection_name, digest.digest()
+
+    def generation(self, collection_name: str) -> int:
+        """
+        Current generation of a collection, incremented by every invalidation. Pass it to put so results of a
+        search that overlapped with an update are not cached.
+
+        Args:
+            collection_name (str): The collection.
+
+        Returns:
+            int: The generation.
+        """
+        return self._generations.get(collection_name, 0)
+
+    def get(self, key: tuple) -> Optional[List[models.ScoredPoint]]:
+        """
+        Look up cached results, counting a hit or a miss.
+
+        Args:
+            key (tuple): The cache key.
+
+        Returns:
+            Optional[List[ScoredPoint]]: The cached results, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and entry[1] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: tuple, points: List[models.ScoredPoint], generation: int):
+        """
+        Cache search results, evicting the least recently used entries beyond the memory budget.
+
+        Args:
+            key (tuple): The cache key.
+            points (List[ScoredPoint]): The search results.
+            generation (int): The generation of the collection when the search started.
+        """
+        nbytes = estimate_result_bytes(points)
+        if nbytes > self.max_bytes:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        with self._lock:
+            if generation != self._generations.get(key[0], 0):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (points, expires, nbytes)
+            self.cached_bytes += nbytes
+            while self.cached_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, collection_name: str):
+        """
+        Drop every cached result of a collection.
+
+        Args:
+            collection_name (str): The collection whose points changed.
+        """
+        with self._lock:
+            self._generations[collection_name] += 1
+            self.invalidations += 1
+            for key in [key for key in self._entries if key[0] == collection_name]:
+                self._remove(key)
+
+    def search(
+        self,
+        qdrant_client: QdrantClient,
+        collection_name: str,
+        query_vector: List[float],
+        query_filter: Optional[models.Filter] = None,
+        limit: int = 10,
+        **kwargs: Any,
+    ) -> List[models.ScoredPoint]:
+        """
+        Cached equivalent of QdrantClient.search.
+
+        Args:
+            qdrant_client (QdrantClient): The client to search with on a miss.
+            collection_name (str): The collection to search.
+            query_vector (List[float]): The query vector.
+            query_filter (Optional[Filter]): The Qdrant filter.
+            limit (int): The number of results. Defaults to 10.
+            **kwargs: Other arguments forwarded to QdrantClient.search, also part of the cache key.
+
+        Returns:
+            List[ScoredPoint]: The search results.
+        """
+        key = self.key(collection_name, query_vector, query_filter, limit, **kwargs)
+        points = self.get(key)
+        if points is None:
+            generation = self.generation(collection_name)
+            points = qdrant_client.search(
+                collection_name=collection_name,
+                query_vector=query_vector,
+                query_filter=query_filter,
+                limit=limit,
+                **kwargs,
+            )
+            self.put(key, points, generation)
+        return points
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Cache metrics for monitoring.
+
+        Returns:
+            Dict[str, float]: Hits, misses, hit rate, evictions, invalidations, entries and cached bytes.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "bytes": self.cached_bytes,
+        }
+
+    def _remove(self, key: tuple):
+        _, _, nbytes = self._entries.pop(key)
+        self.cached_bytes -= nbytes
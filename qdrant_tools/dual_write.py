@@ -0,0 +1,400 @@
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+from qdrant_client.http import models
+
+from qdrant_tools.facade import compile_filter
+from qdrant_tools.vectordb import ID_PAYLOAD_KEY, PineconeExport, QdrantImport
+
+_STOP = object()
+
+
+def _reflects_update(vector: Any, update: Dict[str, Any]) -> bool:
+    # Pinecone is eventually consistent, so a fetch right after an update may still return the old record
+    if "values" in update:
+        values = vector.get("values") or []
+        if len(values) != len(update["values"]) or not np.allclose(values, update["values"]):
+            return False
+    metadata = vector.get("metadata") or {}
+    if any(metadata.get(key) != value for key, value in (update.get("set_metadata") or {}).items()):
+        return False
+    if update.get("sparse_values") is not None:
+        sparse_values = vector.get("sparse_values")
+        if sparse_values is None or list(sparse_values["indices"]) != list(update["sparse_values"]["indices"]):
+            return False
+        if not np.allclose(sparse_values["values"], update["sparse_values"]["values"]):
+            return False
+    return True
+
+
+@dataclass
+class ShadowRead:
+    """
+    Outcome of a query mirrored to Qdrant.
+
+    Args:
+        pinecone_seconds (float): Latency of the Pinecone query.
+        qdrant_seconds (float): Latency of the Qdrant search.
+        overlap (float): Fraction of the Pinecone matches that Qdrant also returned.
+    """
+
+    pinecone_seconds: float
+    qdrant_seconds: float
+    overlap: float
+
+
+class DualWriteClient:
+    """
+    Client wrapper for the period between the bulk migration and the cutover. Writes go to Pinecone
+    synchronously and are queued for Qdrant, where a background thread upserts them in batches. A sampled
+    fraction of queries is mirrored to Qdrant in the background to compare latency and results.
+
+    The Qdrant collection must have been imported with the same QdrantImport settings, including
+    uuid_ids=True, so that every Pinecone id maps to the same point id and mirrored writes update the
+    migrated points.
+
+    Args:
+        pinecone_export (PineconeExport): The export whose index handle serves reads and writes.
+        qdrant_import (QdrantImport): The import whose client and collection receive the mirrored writes.
+        shadow_read_fraction (float): Fraction of queries mirrored to Qdrant. Defaults to 0.01.
+        batch_size (int): Maximum number of writes per Qdrant request. Defaults to the batch size of
+        qdrant_import.
+        flush_interval (float): Maximum number of seconds a write waits before being sent to Qdrant.
+        Defaults to 1.0.
+        max_pending (int): Maximum number of writes queued for Qdrant before write calls block. Defaults to 10000.
+        max_shadow_reads (int): Number of most recent shadow reads kept for shadow_stats. Defaults to 10000.
+        metadata_key (Optional[str]): Payload key the metadata fields are nested under, see compile_filter.
+        Defaults to None.
+        update_timeout (float): Seconds the background thread waits for an update to become visible in Pinecone
+        fetches before the mirrored update is reported as a failed write. Defaults to 30.0.
+
+    Raises:
+        ValueError: If qdrant_import does not map ids with uuid_ids.
+    """
+
+    def __init__(
+        self,
+        pinecone_export: PineconeExport,
+        qdrant_import: QdrantImport,
+        shadow_read_fraction: float = 0.01,
+        batch_size: Optional[int] = None,
+        flush_interval: float = 1.0,
+        max_pending: int = 10000,
+        max_shadow_reads: int = 10000,
+        metadata_key: Optional[str] = None,
+        update_timeout: float = 30.0,
+    ):
+        if not qdrant_import.uuid_ids:
+            # Without uuid_ids non-numeric ids become sequential point ids, which overwrite migrated points
+            raise ValueError("DualWriteClient requires a QdrantImport with uuid_ids=True")
+        self.index = pinecone_export.index
+        self.qdrant_import = qdrant_import
+        self.shadow_read_fraction = shadow_read_fraction
+        self.batch_size = batch_size or qdrant_import.batch_size
+        self.flush_interval = flush_interval
+        self.metadata_key = metadata_key
+        self.update_timeout = update_timeout
+        self.shadow_reads = deque(maxlen=max_shadow_reads)
+        self.shadow_reads_skipped = 0
+        self.shadow_read_errors = 0
+        self.write_errors: List[Exception] = []
+        self._lock = threading.Lock()
+        self._writes = queue.Queue(maxsize=max_pending)
+        self._shadow_executor = ThreadPoolExecutor(max_workers=2)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def upsert(self, vectors: Sequence[Union[dict, tuple]], namespace: Optional[str] = None, **kwargs: Any):
+        """
+        Upsert vectors into Pinecone and queue them for Qdrant.
+
+        Args:
+            vectors (Sequence[Union[dict, tuple]]): Vectors in any format accepted by Pinecone's upsert,
+            i.e. dicts with 'id', 'values' and 'metadata' or (id, values, metadata) tuples.
+            namespace (Optional[str]): The Pinecone namespace to write to.
+            **kwargs: Additional arguments forwarded to Pinecone's upsert.
+
+        Returns:
+            The Pinecone upsert response.
+        """
+        response = self.index.upsert(vectors=vectors, namespace=namespace, **kwargs)
+        self._queue_upserts(vectors, namespace)
+        return response
+
+    def update(self, id: str, namespace: Optional[str] = None, **kwargs: Any):  # pylint: disable=redefined-builtin
+        """
+        Update a vector in Pinecone and queue the update for Qdrant.
+
+        Partial updates cannot be applied to the Qdrant payload layout of QdrantImport, so the background thread
+        fetches the updated vector back from Pinecone, once the fetch reflects the update, and mirrors it as a
+        whole.
+
+        Args:
+            id (str): The id of the vector to update.
+            namespace (Optional[str]): The Pinecone namespace of the vector.
+            **kwargs: Arguments forwarded to Pinecone's update, e.g. values, set_metadata or sparse_values.
+
+        Returns:
+            The Pinecone update response.
+        """
+        response = self.index.update(id=id, namespace=namespace, **kwargs)
+        self._writes.put(("update", namespace, (id, kwargs)))
+        return response
+
+    def delete(
+        self,
+        ids: Optional[List[str]] = None,
+        namespace: Optional[str] = None,
+        delete_all: bool = False,
+        filter: Optional[dict] = None,  # pylint: disable=redefined-builtin
+        **kwargs: Any,
+    ):
+        """
+        Delete vectors from Pinecone and queue their deletion from Qdrant. Only the points of the given
+        namespace are deleted from Qdrant.
+
+        Args:
+            ids (Optional[List[str]]): The ids of the vectors to delete.
+            namespace (Optional[str]): The Pinecone namespace to delete from.
+            delete_all (bool): Delete every vector of the namespace. Defaults to False.
+            filter (Optional[dict]): Delete the vectors matching a Pinecone metadata filter.
+            **kwargs: Additional arguments forwarded to Pinecone's delete.
+
+        Returns:
+            The Pinecone delete response.
+
+        Raises:
+            ValueError: If the filter cannot be translated for Qdrant, in which case Pinecone is left unchanged.
+        """
+        query_filter = None
+        if delete_all or filter is not None:
+            # Translate before writing to Pinecone, so a filter Qdrant cannot mirror is rejected up front
+            query_filter = self._namespace_filter(None if delete_all else filter, namespace)
+        if delete_all:
+            kwargs["delete_all"] = True
+        if filter is not None:
+            kwargs["filter"] = filter
+        response = self.index.delete(ids=ids, namespace=namespace, **kwargs)
+        if query_filter is not None:
+            self._writes.put(("delete_filter", namespace, query_filter))
+        for vector_id in ids or []:
+            self._writes.put(("delete", namespace, vector_id))
+        return response
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int,
+        filter: Optional[dict] = None,  # pylint: disable=redefined-builtin
+        namespace: Optional[str] = None,
+        **kwargs: Any,
+    ):
+        """
+        Query Pinecone and, for a sampled fraction of queries, mirror the query to Qdrant in the background.
+
+        Filters and namespaces are translated with compile_filter, like deletes. Queries whose filter cannot be
+        translated are not mirrored and are counted as skipped.
+
+        Args:
+            vector (List[float]): The query vector.
+            top_k (int): The number of matches to return.
+            filter (Optional[dict]): The Pinecone metadata filter.
+            namespace (Optional[str]): The Pinecone namespace to query.
+            **kwargs: Additional arguments forwarded to Pinecone's query.
+
+        Returns:
+            The Pinecone query response.
+        """
+        start = time.perf_counter()
+        response = self.index.query(vector=vector, top_k=top_k, filter=filter, namespace=namespace, **kwargs)
+        pinecone_seconds = time.perf_counter() - start
+        if random.random() < self.shadow_read_fraction:
+            try:
+                query_filter = self._namespace_filter(filter, namespace)
+            except ValueError:
+                with self._lock:
+                    self.shadow_reads_skipped += 1
+                return response
+            matches = [match["id"] for match in response["matches"]]
+            self._shadow_executor.submit(self._shadow_read, vector, top_k, query_filter, matches, pinecone_seconds)
+        return response
+
+    def shadow_stats(self) -> Dict[str, float]:
+        """
+        Summarize the recorded shadow reads.
+
+        Returns:
+            Dict[str, float]: The number of shadow reads, skipped reads and errors, the mean overlap, and the
+            median and 95th percentile latency of both systems.
+        """
+        stats = {
+            "shadow_reads": len(self.shadow_reads),
+            "skipped": self.shadow_reads_skipped,
+            "errors": self.shadow_read_errors,
+        }
+        if self.shadow_reads:
+            reads = list(self.shadow_reads)
+            stats["mean_overlap"] = float(np.mean([read.overlap for read in reads]))
+            for system in ("pinecone", "qdrant"):
+                seconds = [getattr(read, f"{system}_seconds") for read in reads]
+                stats[f"{system}_p50_seconds"] = float(np.percentile(seconds, 50))
+                stats[f"{system}_p95_seconds"] = float(np.percentile(seconds, 95))
+        return stats
+
+    def flush(self):
+        """
+        Block until every queued write has been sent to Qdrant.
+
+        Raises:
+            InterruptedError: If any Qdrant write failed since the last flush.
+        """
+        self._writes.join()
+        if self.write_errors:
+            errors, self.write_errors = self.write_errors, []
+            raise InterruptedError(f"{len(errors)} Qdrant write batches failed, last error: {errors[-1]!r}")
+
+    def close(self):
+        """
+        Flush the queued writes and stop the background threads.
+        """
+        self._writes.put(_STOP)
+        self._writer.join()
+        self._shadow_executor.shutdown(wait=True)
+        self.flush()
+
+    def _shadow_read(
+        self,
+        vector: List[float],
+        top_k: int,
+        query_filter: models.Filter,
+        pinecone_ids: List[str],
+        pinecone_seconds: float,
+    ):
+        try:
+            start = time.perf_counter()
+            results = self.qdrant_import.qdrant_client.search(
+                collection_name=self.qdrant_import.index_name,
+                query_vector=self.qdrant_import.search_vector(self.qdrant_import.convert_vectors([vector])[0]),
+                query_filter=query_filter,
+                limit=top_k,
+                with_payload=[ID_PAYLOAD_KEY],
+            )
+            qdrant_seconds = time.perf_counter() - start
+        except Exception:  # pylint: disable=broad-except
+            with self._lock:
+                self.shadow_read_errors += 1
+            return
+        expected = set(pinecone_ids)
+        found = {str((result.payload or {}).get(ID_PAYLOAD_KEY, result.id)) for result in results}
+        overlap = len(expected & found) / len(expected) if expected else 1.0
+        self.shadow_reads.append(ShadowRead(pinecone_seconds, qdrant_seconds, overlap))
+
+    def _write_loop(self):
+        stop = False
+        while not stop:
+            item = self._writes.get()
+            if item is _STOP:
+                self._writes.task_done()
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._writes.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._writes.task_done()
+                    stop = True
+                    break
+                batch.append(item)
+            self._write_batch(batch)
+            for _ in batch:
+                self._writes.task_done()
+
+    def _write_batch(self, batch: List[tuple]):
+        # Apply consecutive writes of the same kind and namespace together, keeping the order between them
+        start = 0
+        while start < len(batch):
+            end = start
+            while end < len(batch) and batch[end][:2] == batch[start][:2]:
+                end += 1
+            operation, namespace = batch[start][:2]
+            items = [item for _, _, item in batch[start:end]]
+            try:
+                if operation == "upsert":
+                    self.qdrant_import.upsert_points(self.qdrant_import.to_points(items, namespace))
+                elif operation == "update":
+                    self._mirror_updates(items, namespace)
+                elif operation == "delete":
+                    self._delete(items, namespace)
+                else:
+                    for query_filter in items:
+                        self.qdrant_import.delete_points(models.FilterSelector(filter=query_filter))
+            except Exception as error:  # pylint: disable=broad-except
+                self.write_errors.append(error)
+            start = end
+
+    def _mirror_updates(self, updates: List[tuple], namespace: Optional[str]):
+        # Merge successive updates of a vector, so the fetch is checked against the latest of them
+        pending = {}
+        for vector_id, update in updates:
+            merged = {**pending.get(vector_id, {}), **update}
+            if "set_metadata" in update and "set_metadata" in pending.get(vector_id, {}):
+                merged["set_metadata"] = {**pending[vector_id]["set_metadata"], **update["set_metadata"]}
+            pending[vector_id] = merged
+        deadline = time.monotonic() + self.update_timeout
+        delay = 0.1
+        while True:
+            fetched = self.index.fetch(ids=list(pending), namespace=namespace)["vectors"]
+            visible = [
+                vector_id
+                for vector_id, update in pending.items()
+                if vector_id in fetched and _reflects_update(fetched[vector_id], update)
+            ]
+            if visible:
+                vectors = [self._to_vector(fetched[vector_id]) for vector_id in visible]
+                self.qdrant_import.upsert_points(self.qdrant_import.to_points(vectors, namespace))
+                for vector_id in visible:
+                    del pending[vector_id]
+            if not pending:
+                return
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"{len(pending)} updated vectors were not visible in Pinecone fetches in time")
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+    def _queue_upserts(self, vectors: Iterable[Union[dict, tuple]], namespace: Optional[str]):
+        for vec in vectors:
+            self._writes.put(("upsert", namespace, self._to_vector(vec)))
+
+    @staticmethod
+    def _to_vector(vec: Union[dict, tuple]) -> dict:
+        if isinstance(vec, (tuple, list)):
+            vec = {"id": vec[0], "values": vec[1], "metadata": vec[2] if len(vec) > 2 else {}}
+        return {
+            "id": vec["id"],
+            "values": vec["values"],
+            "metadata": vec.get("metadata") or {},
+            "sparse_values": vec.get("sparse_values"),
+        }
+
+    def _namespace_filter(self, pinecone_filter: Optional[dict], namespace: Optional[str]) -> models.Filter:
+        # Resolve the namespace like QdrantImport.to_payload does when the points are written
+        return compile_filter(pinecone_filter, self.qdrant_import.resolve_namespace(namespace), self.metadata_key)
+
+    def _delete(self, vector_ids: List[str], namespace: Optional[str]):
+        point_ids = [self.qdrant_import.point_id(vector_id, namespace) for vector_id in vector_ids]
+        query_filter = self._namespace_filter(None, namespace)
+        self.qdrant_import.delete_points(
+            models.FilterSelector(
+                filter=models.Filter(must=[models.HasIdCondition(has_id=point_ids)] + list(query_filter.must))
+            )
+        )
@@ -0,0 +1,191 @@
+import json
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from qdrant_client import QdrantClient
+
+from qdrant_tools.vectordb import PineconeExport, QdrantImport
+
+# Qdrant keeps roughly 50% extra on top of the raw vectors for the HNSW graph, ids and version tracking
+QDRANT_MEMORY_OVERHEAD = 1.5
+# Level 0 of an HNSW graph with the default m=16 stores up to 2 * m links of 4 bytes per point
+HNSW_LINK_BYTES = 2 * 16 * 4
+
+# Bytes per dimension kept in RAM and on disk for each collection profile
+COLLECTION_PROFILES = {
+    "in_memory": {"ram_bytes_per_dim": 4, "disk_bytes_per_dim": 4},
+    "scalar_quantized": {"ram_bytes_per_dim": 1, "disk_bytes_per_dim": 5},
+    "on_disk": {"ram_bytes_per_dim": 0, "disk_bytes_per_dim": 4},
+}
+
+
+@dataclass
+class CollectionProfileEstimate:
+    """
+    Predicted Qdrant resource usage of a collection profile.
+
+    Args:
+        ram_bytes (int): Predicted Qdrant memory usage in bytes.
+        disk_bytes (int): Predicted Qdrant disk usage in bytes.
+    """
+
+    ram_bytes: int
+    disk_bytes: int
+
+
+@dataclass
+class MigrationEstimate:
+    """
+    Result of a dry-run migration, extrapolated from a sample to the whole index.
+
+    Args:
+        total_vectors (int): Number of vectors the migration will move.
+        dimension (int): Dimension of the vectors.
+        sampled_vectors (int): Number of vectors that were fetched and upserted during the dry run.
+        fetch_seconds_per_vector (float): Measured Pinecone fetch time per vector.
+        upsert_seconds_per_vector (float): Measured Qdrant upsert time per vector.
+        payload_bytes_per_vector (float): Mean JSON encoded metadata size per vector.
+        client_bytes_per_vector (float): Peak client memory allocated per fetched vector.
+        wall_seconds (float): Predicted wall time of the migration.
+        peak_client_bytes (int): Predicted peak client memory when all points are fetched before upserting.
+        profiles (Dict[str, CollectionProfileEstimate]): Predicted Qdrant resource usage per collection profile.
+    """
+
+    total_vectors: int
+    dimension: int
+    sampled_vectors: int
+    fetch_seconds_per_vector: float
+    upsert_seconds_per_vector: float
+    payload_bytes_per_vector: float
+    client_bytes_per_vector: float
+    wall_seconds: float
+    peak_client_bytes: int
+    profiles: Dict[str, CollectionProfileEstimate] = field(default_factory=dict)
+
+
+def estimate_profiles(
+    total_vectors: int, dimension: int, payload_bytes_per_vector: float
+) -> Dict[str, CollectionProfileEstimate]:
+    """
+    Predict Qdrant memory and disk usage of a collection for every profile in COLLECTION_PROFILES.
+
+    Args:
+        total_vectors (int): Number of vectors in the collection.
+        dimension (int): Dimension of the vectors.
+        payload_bytes_per_vector (float): Mean payload size per vector.
+
+    Returns:
+        Dict[str, CollectionProfileEstimate]: The estimate for each profile name.
+    """
+    payload_bytes = total_vectors * payload_bytes_per_vector
+    estimates = {}
+    for name, profile in COLLECTION_PROFILES.items():
+        vector_ram = total_vectors * dimension * profile["ram_bytes_per_dim"] * QDRANT_MEMORY_OVERHEAD
+        estimates[name] = CollectionProfileEstimate(
+            ram_bytes=int(vector_ram + total_vectors * HNSW_LINK_BYTES),
+            disk_bytes=int(
+                total_vectors * (dimension * profile["disk_bytes_per_dim"] + HNSW_LINK_BYTES) + payload_bytes
+            ),
+        )
+    return estimates
+
+
+def estimate_migration(
+    pinecone_export: PineconeExport,
+    sample_ids: List[str],
+    namespace: Optional[str] = None,
+    qdrant_client: Optional[QdrantClient] = None,
+    sample_batches: int = 3,
+) -> MigrationEstimate:
+    """
+    Dry-run a Pinecone to Qdrant migration on a few batches and extrapolate its cost to the whole index.
+
+    The sample is fetched twice: once batch by batch to time the fetch, and once through
+    PineconeExport.fetch_vectors with allocations traced by tracemalloc to measure client memory. tracemalloc is
+    left running if it was already tracing, e.g. for a MigrationProfiler, in which case the fetch timings are
+    overstated. The sample is then upserted through QdrantImport into a temporary collection with a unique
+    name, which is deleted afterwards.
+
+    Args:
+        pinecone_export (PineconeExport): The export of the index to estimate.
+        sample_ids (List[str]): Ids of vectors known to exist in the index. At most
+        sample_batches * pinecone_export.batch_size of them are used.
+        namespace (Optional[str]): The namespace to migrate. Defaults to the whole index.
+        qdrant_client (Optional[QdrantClient]): Client of the target Qdrant instance used for the upsert sample.
+        If not provided, an in-memory instance is used.
+        sample_batches (int): Number of batches to sample. Defaults to 3.
+
+    Returns:
+        MigrationEstimate: The measured per-vector costs and the extrapolated totals.
+
+    Raises:
+        ValueError: If none of the sample ids exist in the index.
+    """
+    stats = pinecone_export.index.describe_index_stats()
+    if namespace is None:
+        total_vectors = stats["total_vector_count"]
+    else:
+        total_vectors = stats["namespaces"][namespace]["vector_count"]
+
+    sample_ids = sample_ids[: sample_batches * pinecone_export.batch_size]
+    # Tracing slows down decoding the fetched vectors several times over, so the fetch is timed in an
+    # untraced pass and the memory is measured in a separate traced one
+    fetch_seconds = 0.0
+    for i in range(0, len(sample_ids), pinecone_export.batch_size):
+        batch_ids = sample_ids[i : i + pinecone_export.batch_size]
+        start = time.perf_counter()
+        pinecone_export.index.fetch(ids=batch_ids, namespace=namespace)
+        fetch_seconds += time.perf_counter() - start
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    elif hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    start_bytes, _ = tracemalloc.get_traced_memory()
+    try:
+        points_information = pinecone_export.fetch_vectors(sample_ids, namespace=namespace)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+    client_peak_bytes = max(peak_bytes - start_bytes, 0)
+
+    points = points_information["points"]
+    if not points:
+        raise ValueError("None of the sample ids exist in the index")
+    sampled_vectors = len(points)
+    payload_bytes = sum(len(json.dumps(vec.get("metadata", {}))) for vec in points.values())
+
+    points_information["ids"] = list(points)
+    # A unique name, so the dry run never recreates and deletes an existing collection
+    points_information["index_name"] = f"{pinecone_export.index_name}-dry-run-{uuid.uuid4().hex[:12]}"
+    qdrant_import = QdrantImport(**points_information, qdrant_client=qdrant_client)
+    qdrant_import.create_collection()
+    try:
+        start = time.perf_counter()
+        qdrant_import.upsert_vectors()
+        upsert_seconds = time.perf_counter() - start
+    finally:
+        qdrant_import.qdrant_client.delete_collection(collection_name=qdrant_import.index_name)
+
+    dimension = points_information["index_dimension"]
+    fetch_seconds_per_vector = fetch_seconds / sampled_vectors
+    upsert_seconds_per_vector = upsert_seconds / sampled_vectors
+    payload_bytes_per_vector = payload_bytes / sampled_vectors
+    client_bytes_per_vector = client_peak_bytes / sampled_vectors
+    return MigrationEstimate(
+        total_vectors=total_vectors,
+        dimension=dimension,
+        sampled_vectors=sampled_vectors,
+        fetch_seconds_per_vector=fetch_seconds_per_vector,
+        upsert_seconds_per_vector=upsert_seconds_per_vector,
+        payload_bytes_per_vector=payload_bytes_per_vector,
+        client_bytes_per_vector=client_bytes_per_vector,
+        wall_seconds=total_vectors * (fetch_seconds_per_vector + upsert_seconds_per_vector),
+        peak_client_bytes=int(total_vectors * client_bytes_per_vector),
+        profiles=estimate_profiles(total_vectors, dimension, payload_bytes_per_vector),
+    )
@@ -0,0 +1,250 @@
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from qdrant_client.http import models
+
+from qdrant_tools.cache import QueryCache
+from qdrant_tools.vectordb import ID_PAYLOAD_KEY, NAMESPACE_PAYLOAD_KEY, QdrantImport
+
+_STOP = object()
+
+_RANGE_OPERATORS = {"$gt": "gt", "$gte": "gte", "$lt": "lt", "$lte": "lte"}
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _match(key: str, value: Any) -> models.FieldCondition:
+    # Pinecone stores numbers as float64, so migrated payloads hold floats such as 2020.0, which an integer
+    # match does not find. Every number is matched with a range instead.
+    if _is_number(value):
+        return models.FieldCondition(key=key, range=models.Range(gte=value, lte=value))
+    return models.FieldCondition(key=key, match=models.MatchValue(value=value))
+
+
+def _match_any(key: str, values: List[Any]) -> models.Condition:
+    if any(_is_number(value) for value in values):
+        return models.Filter(should=[_match(key, value) for value in values])
+    return models.FieldCondition(key=key, match=models.MatchAny(any=values))
+
+
+def _compile_field(key: str, condition: Any) -> models.Condition:
+    if not isinstance(condition, dict):
+        condition = {"$eq": condition}
+    must, must_not = [], []
+    for operator, value in condition.items():
+        if operator == "$eq":
+            must.append(_match(key, value))
+        elif operator == "$ne":
+            must_not.append(_match(key, value))
+        elif operator in _RANGE_OPERATORS:
+            must.append(models.FieldCondition(key=key, range=models.Range(**{_RANGE_OPERATORS[operator]: value})))
+        elif operator == "$in":
+            must.append(_match_any(key, value))
+        elif operator == "$nin":
+            must_not.append(_match_any(key, value))
+        else:
+            raise ValueError(f"Unsupported Pinecone filter operator: {operator}")
+    if len(must) == 1 and not must_not:
+        return must[0]
+    return models.Filter(must=must or None, must_not=must_not or None)
+
+
+def _compile(pinecone_filter: dict, metadata_key: Optional[str]) -> models.Filter:
+    must = []
+    for key, condition in pinecone_filter.items():
+        if key == "$and":
+            must.extend(_compile(sub_filter, metadata_key) for sub_filter in condition)
+        elif key == "$or":
+            must.append(models.Filter(should=[_compile(sub_filter, metadata_key) for sub_filter in condition]))
+        elif key.startswith("$"):
+            raise ValueError(f"Unsupported Pinecone filter operator: {key}")
+        else:
+            must.append(_compile_field(f"{metadata_key}.{key}" if metadata_key else key, condition))
+    return models.Filter(must=must)
+
+
+@lru_cache(maxsize=1024)
+def _compile_cached(filter_json: str, namespace: Optional[str], metadata_key: Optional[str]) -> models.Filter:
+    must = []
+    if filter_json != "null":
+        must.append(_compile(json.loads(filter_json), metadata_key))
+    if namespace:
+        must.append(models.FieldCondition(key=NAMESPACE_PAYLOAD_KEY, match=models.MatchValue(value=namespace)))
+    else:
+        # The default namespace holds the points stored without a namespace
+        must.append(models.IsEmptyCondition(is_empty=models.PayloadField(key=NAMESPACE_PAYLOAD_KEY)))
+    return models.Filter(must=must)
+
+
+def compile_filter(
+    pinecone_filter: Optional[dict] = None, namespace: Optional[str] = None, metadata_key: Optional[str] = None
+) -> models.Filter:
+    """
+    Translate a Pinecone metadata filter and namespace into a Qdrant filter. Translations are cached, so
+    repeated filters are only compiled once.
+
+    Supports $eq, $ne, $gt, $gte, $lt, $lte, $in, $nin, $and and $or, and the {"field": value} shorthand.
+
+    Args:
+        pinecone_filter (Optional[dict]): The Pinecone metadata filter.
+        namespace (Optional[str]): The Pinecone namespace, matched against NAMESPACE_PAYLOAD_KEY.
+        The default namespace, "" or None, matches the points stored without a namespace.
+        metadata_key (Optional[str]): Payload key the metadata fields are nested under, e.g. "metadata" for
+        vectors whose metadata had a 'text' field. Defaults to None, for metadata stored at the top level.
+
+    Returns:
+        Filter: The Qdrant filter.
+
+    Raises:
+        ValueError: If the filter uses an unsupported operator.
+    """
+    return _compile_cached(json.dumps(pinecone_filter, sort_keys=True), namespace, metadata_key)
+
+
+class PineconeQueryFacade:
+    """
+    Pinecone-compatible query interface over a migrated Qdrant collection, so call sites of
+    index.query(vector, top_k, filter, namespace) keep working after the cutover.
+
+    Queries arriving concurrently within batch_window seconds are coalesced into a single search_batch
+    request, raising throughput under load at the cost of at most batch_window of added latency.
+
+    Args:
+        qdrant_import (QdrantImport): The import the collection was migrated with. Its client and collection are
+        searched and its vector conversion is applied to query vectors.
+        metadata_key (Optional[str]): Payload key the metadata fields are nested under. Defaults to None.
+        batch_window (float): Seconds to wait for more queries before sending a batch. Defaults to 0.002.
+        max_batch_size (int): Maximum number of queries per search_batch request. Defaults to 64.
+        max_concurrent_batches (int): Maximum number of search_batch requests in flight. Defaults to 4.
+        cache (Optional[QueryCache]): Cache of search results, attached to the collection so writes into it
+        through any QdrantImport invalidate the cached results. Defaults to None, which disables caching.
+    """
+
+    def __init__(
+        self,
+        qdrant_import: QdrantImport,
+        metadata_key: Optional[str] = None,
+        batch_window: float = 0.002,
+        max_batch_size: int = 64,
+        max_concurrent_batches: int = 4,
+        cache: Optional[QueryCache] = None,
+    ):
+        self.qdrant_import = qdrant_import
+        self.metadata_key = metadata_key
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.cache = cache
+        if cache is not None:
+            cache.attach(qdrant_import)
+        self._requests = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_batches)
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._dispatcher.start()
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int = 10,
+        filter: Optional[dict] = None,  # pylint: disable=redefined-builtin
+        namespace: Optional[str] = None,
+        include_values: bool = False,
+        include_metadata: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Search the collection like Pinecone's index.query.
+
+        Args:
+            vector (List[float]): The query vector.
+            top_k (int): The number of matches to return. Defaults to 10.
+            filter (Optional[dict]): The Pinecone metadata filter.
+            namespace (Optional[str]): The Pinecone namespace to search. Defaults to the namespace of the import.
+            include_values (bool): Whether to return the vector of each match. Defaults to False.
+            include_metadata (bool): Whether to return the metadata of each match. Defaults to False.
+
+        Returns:
+            Dict[str, Any]: A Pinecone-shaped response with 'matches' and 'namespace'.
+        """
+        query_vector = self.qdrant_import.convert_vectors([vector])[0]
+        request = models.SearchRequest(
+            vector=self.qdrant_import.search_vector(query_vector),
+            filter=compile_filter(filter, self.qdrant_import.resolve_namespace(namespace), self.metadata_key),
+            limit=top_k,
+            # The payload is always needed to recover non-numeric Pinecone ids
+            with_payload=True,
+            with_vector=include_values,
+        )
+        points = None
+        if self.cache is not None:
+            key = self.cache.key(
+                self.qdrant_import.index_name, query_vector, request.filter, top_k, with_vector=include_values
+            )
+            points = self.cache.get(key)
+        if points is None:
+            generation = self.cache.generation(self.qdrant_import.index_name) if self.cache is not None else None
+            future = Future()
+            self._requests.put((request, future))
+            points = future.result()
+            if self.cache is not None:
+                self.cache.put(key, points, generation)
+        matches = [self._to_match(point, include_values, include_metadata) for point in points]
+        return {"matches": matches, "namespace": namespace or ""}
+
+    def close(self):
+        """
+        Stop the dispatcher once the pending queries are answered.
+        """
+        self._requests.put(_STOP)
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+
+    def _to_match(self, point: models.ScoredPoint, include_values: bool, include_metadata: bool) -> Dict[str, Any]:
+        payload = point.payload or {}
+        match = {"id": str(payload.get(ID_PAYLOAD_KEY, point.id)), "score": float(point.score)}
+        if include_values:
+            match["values"] = point.vector
+        if include_metadata:
+            if "text" in payload and isinstance(payload.get("metadata"), dict):
+                match["metadata"] = dict(payload["metadata"])
+            else:
+                match["metadata"] = {
+                    key: value for key, value in payload.items() if key not in (ID_PAYLOAD_KEY, NAMESPACE_PAYLOAD_KEY)
+                }
+        return match
+
+    def _dispatch_loop(self):
+        stop = False
+        while not stop:
+            item = self._requests.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._requests.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._executor.submit(self._search_batch, batch)
+
+    def _search_batch(self, batch: List[Tuple[models.SearchRequest, Future]]):
+        try:
+            results = self.qdrant_import.qdrant_client.search_batch(
+                collection_name=self.qdrant_import.index_name, requests=[request for request, _ in batch]
+            )
+        except Exception as error:  # pylint: disable=broad-except
+            for _, future in batch:
+                future.set_exception(error)
+            return
+        for (_, future), points in zip(batch, results):
+            future.set_result(points)
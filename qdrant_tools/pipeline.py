@@ -0,0 +1,258 @@
+import sys
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from qdrant_tools.vectordb import PineconeExport, QdrantImport, VectorDatabaseHandler
+
+# A float inside a Python list costs a 24 byte float object plus an 8 byte pointer
+PYTHON_FLOAT_BYTES = 32
+
+
+def estimate_vector_bytes(vec: dict) -> int:
+    """
+    Cheaply estimate the client memory held by a fetched Pinecone vector.
+
+    Args:
+        vec (dict): A Pinecone vector with 'values' and optionally 'metadata'.
+
+    Returns:
+        int: The approximate number of bytes the vector occupies.
+    """
+    metadata = vec.get("metadata") or {}
+    metadata_bytes = sys.getsizeof(metadata) + sum(sys.getsizeof(value) for value in metadata.values())
+    sparse_values = vec.get("sparse_values") or {}
+    sparse_bytes = 2 * len(sparse_values.get("indices", [])) * PYTHON_FLOAT_BYTES
+    return len(vec["values"]) * PYTHON_FLOAT_BYTES + metadata_bytes + sparse_bytes
+
+
+class ByteBoundedQueue:
+    """
+    FIFO queue between two pipeline stages, bounded by the total size of its items rather than their count.
+
+    The bytes of an item stay reserved after get until the consumer calls release, so items being
+    processed count against the budget as well as buffered ones. Producers block in put while the budget
+    is exhausted. An item larger than the whole budget is still admitted once nothing is reserved, so a
+    single oversized batch cannot deadlock the pipeline.
+
+    Args:
+        max_bytes (int): The byte budget of the queue.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.buffered_bytes = 0
+        self._items = deque()
+        self._closed = False
+        self._aborted = False
+        self._condition = threading.Condition()
+
+    @property
+    def depth(self) -> int:
+        """
+        Number of items currently buffered.
+        """
+        return len(self._items)
+
+    def put(self, item: Any, nbytes: int) -> bool:
+        """
+        Add an item to the queue, blocking while the byte budget is exhausted.
+
+        Args:
+            item (Any): The item to enqueue.
+            nbytes (int): The number of bytes accounted for the item.
+
+        Returns:
+            bool: False if the queue was closed and the item was dropped, True otherwise.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._closed or self.buffered_bytes == 0 or self.buffered_bytes + nbytes <= self.max_bytes
+            )
+            if self._closed:
+                return False
+            self._items.append((item, nbytes))
+            self.buffered_bytes += nbytes
+            self._condition.notify_all()
+            return True
+
+    def get(self) -> Optional[Any]:
+        """
+        Remove and return the oldest item, blocking until one is available. Its bytes stay reserved until
+        release is called.
+
+        Returns:
+            Optional[Any]: The item, or None once the queue is closed and drained.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._items or self._closed)
+            if not self._items:
+                return None
+            item, _ = self._items.popleft()
+            return item
+
+    def release(self, nbytes: int):
+        """
+        Return the bytes of an item taken with get to the budget once it has been processed.
+
+        Args:
+            nbytes (int): The number of bytes accounted for the item.
+        """
+        with self._condition:
+            # abort already returned every reserved byte
+            if not self._aborted:
+                self.buffered_bytes -= nbytes
+            self._condition.notify_all()
+
+    def close(self):
+        """
+        Mark the end of the stream. Blocked producers return and consumers drain the remaining items.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def abort(self):
+        """
+        Close the queue and discard every buffered item.
+        """
+        with self._condition:
+            self._items.clear()
+            self.buffered_bytes = 0
+            self._closed = True
+            self._aborted = True
+            self._condition.notify_all()
+
+
+class MigrationPipeline(VectorDatabaseHandler):
+    """
+    Class to stream vectors from Pinecone into Qdrant through fetch, transform and upsert stages running
+    in parallel, with byte-bounded queues between them so client memory stays within max_buffer_mb.
+
+    A batch is accounted from the moment it has been fetched until its upsert finishes, so batches being
+    transformed and upserted count against the budget. Only the batch currently being fetched is not
+    accounted, as its size is unknown until it arrives.
+
+    Args:
+        pinecone_export (PineconeExport): The export to fetch vectors with.
+        qdrant_import (QdrantImport): The import to transform and upsert vectors with.
+        max_buffer_mb (float): Memory budget in MB of the fetched batches not yet upserted, split evenly
+        between the batches awaiting or in transform and those awaiting or in upsert. Defaults to 256.
+        upsert_workers (int): Number of threads upserting into Qdrant concurrently. Defaults to 1.
+        batch_size (int, optional): Number of ids fetched per Pinecone request. Defaults to the batch size
+        of pinecone_export.
+    """
+
+    def __init__(
+        self,
+        pinecone_export: PineconeExport,
+        qdrant_import: QdrantImport,
+        max_buffer_mb: float = 256,
+        upsert_workers: int = 1,
+        batch_size: Optional[int] = None,
+    ):
+        super().__init__(batch_size or pinecone_export.batch_size)
+        self.pinecone_export = pinecone_export
+        self.qdrant_import = qdrant_import
+        self.upsert_workers = upsert_workers
+        self.max_buffer_mb = max_buffer_mb
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        queue_bytes = int(self.max_buffer_mb * 1024 * 1024 / 2)
+        self.fetched = ByteBoundedQueue(queue_bytes)
+        self.transformed = ByteBoundedQueue(queue_bytes)
+        self.upserted = 0
+        self._error = None
+
+    def queue_depths(self) -> Dict[str, Dict[str, int]]:
+        """
+        Current fill level of the queues between the stages, for monitoring.
+
+        Returns:
+            Dict[str, Dict[str, int]]: The number of buffered items and bytes of each queue.
+        """
+        return {
+            name: {"items": queue.depth, "bytes": queue.buffered_bytes}
+            for name, queue in (("fetched", self.fetched), ("transformed", self.transformed))
+        }
+
+    def run(self, ids: List[str], namespace: Optional[str] = None) -> int:
+        """
+        Migrate the given ids from Pinecone to Qdrant. The Qdrant collection must already exist.
+
+        Args:
+            ids (List[str]): The ids of the vectors to migrate.
+            namespace (Optional[str]): The Pinecone namespace to fetch from.
+
+        Returns:
+            int: The number of points upserted.
+
+        Raises:
+            Exception: The first exception raised by any stage.
+        """
+        self._reset()
+        threads = [
+            threading.Thread(target=self._run_stage, args=(self._fetch, ids, namespace)),
+            threading.Thread(target=self._run_stage, args=(self._transform, namespace)),
+        ]
+        threads += [threading.Thread(target=self._run_stage, args=(self._upsert,)) for _ in range(self.upsert_workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self._error is not None:
+            raise self._error
+        return self.upserted
+
+    def _run_stage(self, stage: Callable, *args):
+        try:
+            stage(*args)
+        except Exception as error:  # pylint: disable=broad-except
+            with self._lock:
+                if self._error is None:
+                    self._error = error
+            self.fetched.abort()
+            self.transformed.abort()
+
+    def _fetch(self, ids: List[str], namespace: Optional[str]):
+        def fetch_batch(batch_ids: List[str]):
+            with self.pinecone_export.profiler.stage("fetch"):
+                vectors = self.pinecone_export.index.fetch(ids=batch_ids, namespace=namespace)["vectors"]
+            nbytes = sum(estimate_vector_bytes(vec) for vec in vectors.values())
+            if not self.fetched.put((vectors, nbytes), nbytes):
+                raise InterruptedError("Pipeline aborted")
+
+        try:
+            self.process_in_batches(ids, fetch_batch)
+        finally:
+            self.fetched.close()
+
+    def _transform(self, namespace: Optional[str]):
+        try:
+            while True:
+                item = self.fetched.get()
+                if item is None:
+                    break
+                vectors, nbytes = item
+                points = self.qdrant_import.to_points(vectors.values(), namespace)
+                # The batch is accounted in the next queue before its fetched bytes are released
+                self.transformed.put((points, nbytes), nbytes)
+                self.fetched.release(nbytes)
+        finally:
+            self.transformed.close()
+
+    def _upsert(self):
+        while True:
+            item = self.transformed.get()
+            if item is None:
+                break
+            points, nbytes = item
+            try:
+                if points:
+                    self.qdrant_import.upsert_points(points)
+            finally:
+                self.transformed.release(nbytes)
+            with self._lock:
+                self.upserted += len(points)
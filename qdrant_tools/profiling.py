@@ -0,0 +1,309 @@
+import ast
+import contextlib
+import linecache
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+_DISABLED_STAGE = nullcontext()
+
+
+@dataclass
+class StageStats:
+    """
+    Time and memory recorded for one stage across its batches.
+
+    Args:
+        batches (int): Number of batches the stage processed.
+        wall_seconds (float): Total wall time spent in the stage.
+        cpu_seconds (float): Total CPU time of the threads running the stage.
+        allocated_bytes (int): Net traced memory still allocated when the batches finished.
+        peak_bytes (int): Highest increase of traced memory over the start of a batch.
+        batch_seconds (List[float]): Wall time of every batch.
+        batch_peak_bytes (List[int]): Peak increase of traced memory over the start of every batch.
+        cpu_samples (Counter): Number of CPU samples per source line executing the stage.
+        snapshot_batches (int): Number of batches snapshotted at their entry and exit.
+        allocations (Counter): Net bytes allocated per source line during the snapshotted batches.
+        allocations_filtered (bool): Whether allocations were limited to tracebacks passing through the stage's
+        with statement, which needs tracemalloc to keep more than one frame per allocation.
+    """
+
+    batches: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    allocated_bytes: int = 0
+    peak_bytes: int = 0
+    batch_seconds: List[float] = field(default_factory=list)
+    batch_peak_bytes: List[int] = field(default_factory=list)
+    cpu_samples: Counter = field(default_factory=Counter)
+    snapshot_batches: int = 0
+    allocations: Counter = field(default_factory=Counter)
+    allocations_filtered: bool = True
+
+
+class MigrationProfiler:
+    """
+    Opt-in memory and CPU profiler of migration stages such as fetch, transform and upsert.
+
+    Attached handlers wrap every batch of a stage in stage(). While enabled, each batch records its wall
+    and CPU time and the traced memory allocated and peaking during it, and a background thread samples the
+    stack of every thread inside a stage. Sampled batches are also snapshotted with tracemalloc at their
+    entry and exit, and the differences are accumulated per stage to report its top allocators. Batches are
+    only recorded between start() and stop(). While disabled, stage() returns a shared no-op context
+    manager, so instrumented code costs a single method call per batch.
+
+    Traced memory is process-wide and the peak is reset at the start of every batch, so with stages running
+    concurrently, as in MigrationPipeline, per-stage peaks are approximate. Snapshot differences include the
+    allocations of every thread, so with frames > 1 only allocations whose traceback passes through the
+    stage's with statement are attributed to it. With frames=1 allocators are only meaningful for sequential
+    runs, which the report points out.
+
+    Args:
+        enabled (bool): Whether to profile. Defaults to True.
+        sample_interval (Optional[float]): Seconds between CPU samples, None disables sampling. Defaults to 0.005.
+        snapshot_every (int): Snapshot the first and every snapshot_every-th batch of a stage at its entry and
+        exit, 0 only snapshots the first batch. Defaults to 10.
+        frames (int): Number of frames tracemalloc keeps per allocation. Allocations made deeper than frames
+        below a stage's with statement are not attributed to it. Defaults to 1.
+        top_n (int): Number of allocators and sampled lines listed per stage in the report. Defaults to 5.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        sample_interval: Optional[float] = 0.005,
+        snapshot_every: int = 10,
+        frames: int = 1,
+        top_n: int = 5,
+    ):
+        self.enabled = enabled
+        self.sample_interval = sample_interval
+        self.snapshot_every = snapshot_every
+        self.frames = frames
+        self.top_n = top_n
+        self.stats: Dict[str, StageStats] = defaultdict(StageStats)
+        self._started_batches: Counter = Counter()
+        self._active: Dict[int, List[str]] = {}
+        self._lock = threading.Lock()
+        self._started_tracing = False
+        self._sampler: Optional[threading.Thread] = None
+        self._stop_sampling = threading.Event()
+
+    def attach(self, *handlers):
+        """
+        Profile the batches of the given handlers, e.g. a PineconeExport and a QdrantImport.
+
+        Args:
+            *handlers: Objects whose profiler attribute is replaced by this profiler.
+        """
+        for handler in handlers:
+            handler.profiler = self
+
+    def start(self):
+        """
+        Start tracing allocations and sampling CPU. Does nothing while disabled.
+        """
+        if not self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        if self.sample_interval is not None:
+            self._stop_sampling.clear()
+            self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        """
+        Stop sampling CPU, and tracing allocations if start began tracing.
+        """
+        if self._sampler is not None:
+            self._stop_sampling.set()
+            self._sampler.join()
+            self._sampler = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def __enter__(self) -> "MigrationProfiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stage(self, name: str):
+        """
+        Context manager profiling one batch of a stage.
+
+        Args:
+            name (str): Name of the stage, e.g. "fetch", "transform" or "upsert".
+
+        Returns:
+            A context manager, a no-op one while disabled.
+        """
+        if not self.enabled or not tracemalloc.is_tracing():
+            return _DISABLED_STAGE
+        return self._profile_stage(name)
+
+    @contextmanager
+    def _profile_stage(self, name: str) -> Iterator[None]:
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._started_batches[name] += 1
+            started = self._started_batches[name]
+        entry_snapshot, stage_lines = None, None
+        if started == 1 or (self.snapshot_every and started % self.snapshot_every == 0):
+            # Locate the with statement first, so parsing its source is not attributed to the stage
+            stage_lines = _stage_lines(sys._getframe(1))  # pylint: disable=protected-access
+            entry_snapshot = _take_snapshot()
+        # Only mark the stage active once snapshotting is done, so its cost is not sampled as the stage's
+        with self._lock:
+            self._active.setdefault(thread_id, []).append(name)
+        # Let this batch measure its own peak, reset_peak needs Python 3.9
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        start_bytes, _ = tracemalloc.get_traced_memory()
+        start_wall, start_cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall_seconds = time.perf_counter() - start_wall
+            cpu_seconds = time.thread_time() - start_cpu
+            current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+            batch_peak_bytes = max(peak_bytes - start_bytes, 0)
+            with self._lock:
+                self._active[thread_id].pop()
+                stats = self.stats[name]
+                stats.batches += 1
+                stats.wall_seconds += wall_seconds
+                stats.cpu_seconds += cpu_seconds
+                stats.allocated_bytes += current_bytes - start_bytes
+                stats.peak_bytes = max(stats.peak_bytes, batch_peak_bytes)
+                stats.batch_seconds.append(wall_seconds)
+                stats.batch_peak_bytes.append(batch_peak_bytes)
+            if entry_snapshot is not None:
+                self._record_allocations(stats, entry_snapshot, stage_lines)
+
+    def _record_allocations(
+        self, stats: StageStats, entry_snapshot: tracemalloc.Snapshot, stage_lines: Optional[Tuple[str, int, int]]
+    ):
+        # Diff against the entry of this batch, so only allocations made while it ran are attributed. Other
+        # threads allocate meanwhile too, so keep the tracebacks passing through the stage's with statement
+        # but not through the profiler itself.
+        filtered = stage_lines is not None and tracemalloc.get_traceback_limit() > 1
+        diffs = _take_snapshot().compare_to(entry_snapshot, "traceback" if filtered else "lineno")
+        with self._lock:
+            stats.snapshot_batches += 1
+            stats.allocations_filtered = stats.allocations_filtered and filtered
+            for diff in diffs:
+                if not diff.size_diff:
+                    continue
+                if filtered:
+                    filename, first_line, last_line = stage_lines
+                    if not any(
+                        frame.filename == filename and first_line <= frame.lineno <= last_line
+                        for frame in diff.traceback
+                    ) or any(frame.filename == __file__ for frame in diff.traceback):
+                        continue
+                # Tracebacks are ordered from the oldest frame, so the last one made the allocation
+                frame = diff.traceback[-1]
+                stats.allocations[(frame.filename, frame.lineno)] += diff.size_diff
+
+    def _sample_loop(self):
+        while not self._stop_sampling.wait(self.sample_interval):
+            frames = sys._current_frames()  # pylint: disable=protected-access
+            with self._lock:
+                for thread_id, stages in self._active.items():
+                    frame = frames.get(thread_id)
+                    if stages and frame is not None:
+                        code = frame.f_code
+                        location = f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}"
+                        self.stats[stages[-1]].cpu_samples[location] += 1
+
+    def report(self) -> str:
+        """
+        Compact text report of the time breakdown, peak memory, top allocators and sampled lines per stage.
+
+        Returns:
+            str: The report.
+        """
+        total_seconds = sum(stats.wall_seconds for stats in self.stats.values()) or 1.0
+        lines = [
+            f"{'stage':<12} {'batches':>7} {'wall s':>8} {'share':>6} {'cpu s':>8} {'max batch s':>11} "
+            f"{'peak MB':>8} {'net MB':>8}"
+        ]
+        for name, stats in self.stats.items():
+            lines.append(
+                f"{name:<12} {stats.batches:>7} {stats.wall_seconds:>8.2f} "
+                f"{stats.wall_seconds / total_seconds:>6.1%} {stats.cpu_seconds:>8.2f} "
+                f"{max(stats.batch_seconds, default=0):>11.3f} {stats.peak_bytes / 1024 / 1024:>8.1f} "
+                f"{stats.allocated_bytes / 1024 / 1024:>8.1f}"
+            )
+        for name, stats in self.stats.items():
+            if stats.allocations:
+                caveat = "" if stats.allocations_filtered else ", unfiltered, so only meaningful for sequential runs"
+                lines.append(f"\n{name}: top allocators of {stats.snapshot_batches} snapshotted batches{caveat}")
+                for (filename, lineno), size in stats.allocations.most_common(self.top_n):
+                    source = linecache.getline(filename, lineno).strip()
+                    lines.append(f"  {size / 1024 / 1024:>+8.1f} MB  {os.path.basename(filename)}:{lineno}  {source}")
+            if stats.cpu_samples:
+                samples = sum(stats.cpu_samples.values())
+                lines.append(f"{name}: top sampled lines of {samples} samples")
+                for location, count in stats.cpu_samples.most_common(self.top_n):
+                    lines.append(f"  {count / samples:>6.1%}  {location}")
+        return "\n".join(lines)
+
+    def write_report(self, path: str):
+        """
+        Write the report to a text file.
+
+        Args:
+            path (str): Path of the report file.
+        """
+        with open(path, "w", encoding="utf-8") as report_file:
+            report_file.write(self.report() + "\n")
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    # Leave out the memory of tracemalloc and the profiler themselves, e.g. earlier snapshots still alive
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    )
+
+
+def _stage_lines(frame) -> Optional[Tuple[str, int, int]]:
+    # Skip the frames of the context manager machinery to reach the with statement that entered the stage
+    while frame is not None and frame.f_code.co_filename in (__file__, contextlib.__file__):
+        frame = frame.f_back
+    if frame is None:
+        return None
+    block = _with_block(frame.f_code.co_filename, frame.f_lineno)
+    return (frame.f_code.co_filename, *block) if block is not None else None
+
+
+@lru_cache(maxsize=256)
+def _with_block(filename: str, lineno: int) -> Optional[Tuple[int, int]]:
+    # First and last line of the innermost with statement whose header contains lineno
+    source = "".join(linecache.getlines(filename))
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    blocks = [
+        (node.lineno, node.end_lineno)
+        for node in ast.walk(tree)
+        if isinstance(node, (ast.With, ast.AsyncWith)) and node.lineno <= lineno < node.body[0].lineno
+    ]
+    return max(blocks) if blocks else None
+
+
+# Shared by every handler that has no profiler attached
+NULL_PROFILER = MigrationProfiler(enabled=False)
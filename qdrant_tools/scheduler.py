@@ -0,0 +1,303 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from qdrant_client import QdrantClient
+
+from qdrant_tools.pipeline import PYTHON_FLOAT_BYTES
+from qdrant_tools.vectordb import PineconeExport, QdrantImport
+
+
+@dataclass
+class MigrationJob:
+    """
+    Migration of one Pinecone index, or one namespace of it, into a Qdrant collection.
+
+    Args:
+        index_name (str): Name of the Pinecone index to migrate.
+        ids (List[str]): The ids of the vectors to migrate.
+        collection_name (Optional[str]): Name of the Qdrant collection. Defaults to index_name.
+        namespace (Optional[str]): The Pinecone namespace to migrate.
+        priority (int): Jobs with a higher priority start first, ties start with the largest job. Defaults to 0.
+        dimension (Optional[int]): Dimension of the vectors. Defaults to the dimension reported by Pinecone.
+        recreate (bool): Whether to (re)create the collection before migrating. Jobs sharing a collection
+        create it once, before any of them writes, if any of them sets recreate. Defaults to True.
+        import_params (Dict[str, Any]): Additional arguments for QdrantImport, e.g. datatype or uuid_ids. Must
+        be the same for every job of a collection.
+        collection_params (Dict[str, Any]): Additional arguments for QdrantImport.create_collection, taken from
+        the first job of a collection to start.
+    """
+
+    index_name: str
+    ids: List[str]
+    collection_name: Optional[str] = None
+    namespace: Optional[str] = None
+    priority: int = 0
+    dimension: Optional[int] = None
+    recreate: bool = True
+    import_params: Dict[str, Any] = field(default_factory=dict)
+    collection_params: Dict[str, Any] = field(default_factory=dict)
+    status: str = "pending"
+    upserted: int = 0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    error: Optional[Exception] = None
+
+    def __post_init__(self):
+        if self.collection_name is None:
+            self.collection_name = self.index_name
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Progress of the job.
+
+        Returns:
+            Dict[str, Any]: The index, collection, status, vectors upserted out of the total, elapsed seconds,
+            throughput in vectors per second and error of the job.
+        """
+        elapsed = 0.0
+        if self.started is not None:
+            elapsed = (self.finished or time.monotonic()) - self.started
+        return {
+            "index": self.index_name,
+            "collection": self.collection_name,
+            "namespace": self.namespace,
+            "status": self.status,
+            "upserted": self.upserted,
+            "total": len(self.ids),
+            "seconds": elapsed,
+            "vectors_per_second": self.upserted / elapsed if elapsed else 0.0,
+            "error": repr(self.error) if self.error is not None else None,
+        }
+
+
+def load_manifest(path: str) -> List[MigrationJob]:
+    """
+    Read migration jobs from a JSON manifest, a list of objects with the fields of MigrationJob. Instead of
+    'ids', a job may give 'ids_path', a text file with one vector id per line.
+
+    Args:
+        path (str): Path of the manifest.
+
+    Returns:
+        List[MigrationJob]: The jobs of the manifest.
+    """
+    with open(path, "r", encoding="utf-8") as manifest_file:
+        entries = json.load(manifest_file)
+    jobs = []
+    for entry in entries:
+        entry = dict(entry)
+        ids_path = entry.pop("ids_path", None)
+        if ids_path is not None:
+            with open(ids_path, "r", encoding="utf-8") as ids_file:
+                entry["ids"] = [line.strip() for line in ids_file if line.strip()]
+        jobs.append(MigrationJob(**entry))
+    return jobs
+
+
+class ByteBudget:
+    """
+    Memory budget shared by concurrent tasks. A reservation larger than the whole budget is still granted
+    once nothing else is reserved, so a single oversized batch cannot deadlock the scheduler.
+
+    Args:
+        max_bytes (int): The byte budget.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.reserved_bytes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, nbytes: int):
+        """
+        Reserve bytes, blocking until they fit in the budget.
+
+        Args:
+            nbytes (int): The number of bytes to reserve.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.reserved_bytes == 0 or self.reserved_bytes + nbytes <= self.max_bytes)
+            self.reserved_bytes += nbytes
+
+    def release(self, nbytes: int):
+        """
+        Return reserved bytes to the budget.
+
+        Args:
+            nbytes (int): The number of bytes to release.
+        """
+        with self._condition:
+            self.reserved_bytes -= nbytes
+            self._condition.notify_all()
+
+
+class MigrationScheduler:
+    """
+    Class to migrate many Pinecone indexes into Qdrant concurrently under global limits.
+
+    Up to max_jobs jobs run at once, in order of priority and then size. Their batches share a pool of
+    max_workers threads, at most max_in_flight Pinecone and Qdrant requests are outstanding at any time, and
+    fetched batches held in memory stay within max_buffer_mb. A failed job is reported and does not stop the
+    other jobs. Jobs migrating into the same collection, e.g. one per namespace, share one QdrantImport.
+
+    Args:
+        jobs (List[MigrationJob]): The jobs to run, see load_manifest.
+        qdrant_client (Optional[QdrantClient]): Client of the target Qdrant instance. If not provided, a new
+        in-memory instance is created.
+        max_jobs (int): Maximum number of jobs running concurrently. Defaults to 4.
+        max_workers (int): Number of threads fetching and upserting batches across all jobs. Defaults to 8.
+        max_in_flight (int): Maximum number of Pinecone and Qdrant requests outstanding across all jobs.
+        Defaults to 8.
+        max_buffer_mb (float): Memory budget in MB of the batches being fetched and upserted. Defaults to 512.
+        batch_size (int): Number of vectors per batch. Defaults to 1000.
+        transport (str): Pinecone transport, 'rest' or 'grpc', see PineconeExport. Defaults to 'rest'.
+        export_factory (Optional[Callable[[MigrationJob], PineconeExport]]): Creates the export of a job.
+        Defaults to a PineconeExport of the job's index.
+    """
+
+    def __init__(
+        self,
+        jobs: List[MigrationJob],
+        qdrant_client: Optional[QdrantClient] = None,
+        max_jobs: int = 4,
+        max_workers: int = 8,
+        max_in_flight: int = 8,
+        max_buffer_mb: float = 512,
+        batch_size: int = 1000,
+        transport: str = "rest",
+        export_factory: Optional[Callable[[MigrationJob], PineconeExport]] = None,
+    ):
+        self.jobs = sorted(jobs, key=lambda job: (-job.priority, -len(job.ids)))
+        self.qdrant_client = qdrant_client if qdrant_client is not None else QdrantClient(":memory:")
+        self.max_jobs = max_jobs
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.budget = ByteBudget(int(max_buffer_mb * 1024 * 1024))
+        self.export_factory = export_factory or (
+            lambda job: PineconeExport(job.index_name, batch_size=batch_size, transport=transport)
+        )
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._imports: Dict[str, QdrantImport] = {}
+        self._import_params: Dict[str, Dict[str, Any]] = {}
+        self._collection_locks = defaultdict(threading.Lock)
+
+    def run(self) -> List[Dict[str, Any]]:
+        """
+        Run every job and wait for all of them to finish.
+
+        Returns:
+            List[Dict[str, Any]]: The final report of every job, see MigrationJob.report.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as workers:
+            with ThreadPoolExecutor(max_workers=self.max_jobs) as runners:
+                for job in self.jobs:
+                    runners.submit(self._run_job, job, workers)
+        return self.status()
+
+    def status(self) -> List[Dict[str, Any]]:
+        """
+        Current progress of every job, for monitoring while run is in progress.
+
+        Returns:
+            List[Dict[str, Any]]: The report of every job, in scheduling order.
+        """
+        return [job.report() for job in self.jobs]
+
+    def _run_job(self, job: MigrationJob, workers: ThreadPoolExecutor):
+        job.status = "running"
+        job.started = time.monotonic()
+        try:
+            pinecone_export = self.export_factory(job)
+            qdrant_import = self._collection_import(job, pinecone_export)
+            # Every batch is fetched as Python floats before it becomes an array, so reserve for that
+            batch_bytes = self.batch_size * qdrant_import.index_dimension * PYTHON_FLOAT_BYTES
+            futures = []
+            try:
+                for i in range(0, len(job.ids), self.batch_size):
+                    # Stop scheduling batches of a job once one of them failed
+                    if job.error is not None:
+                        break
+                    self.budget.acquire(batch_bytes)
+                    futures.append(
+                        workers.submit(
+                            self._migrate_batch,
+                            job,
+                            pinecone_export,
+                            qdrant_import,
+                            job.ids[i : i + self.batch_size],
+                            batch_bytes,
+                        )
+                    )
+            finally:
+                wait(futures)
+            if job.error is not None:
+                raise job.error
+            job.status = "done"
+        except Exception as error:  # pylint: disable=broad-except
+            with self._lock:
+                if job.error is None:
+                    job.error = error
+            job.status = "failed"
+        finally:
+            job.finished = time.monotonic()
+
+    def _collection_import(self, job: MigrationJob, pinecone_export: PineconeExport) -> QdrantImport:
+        # The first job of a collection to start creates its import and, if needed, the collection, while the
+        # other jobs of the collection wait, so no job writes into a collection that is still being recreated
+        with self._lock:
+            collection_lock = self._collection_locks[job.collection_name]
+        with collection_lock:
+            qdrant_import = self._imports.get(job.collection_name)
+            if qdrant_import is None:
+                dimension = job.dimension
+                if dimension is None:
+                    with self._in_flight:
+                        dimension = pinecone_export.index.describe_index_stats()["dimension"]
+                qdrant_import = QdrantImport(
+                    ids=[],
+                    index_name=job.collection_name,
+                    index_dimension=dimension,
+                    points={},
+                    qdrant_client=self.qdrant_client,
+                    batch_size=self.batch_size,
+                    **job.import_params,
+                )
+                if any(other.recreate for other in self.jobs if other.collection_name == job.collection_name):
+                    with self._in_flight:
+                        qdrant_import.create_collection(**job.collection_params)
+                self._imports[job.collection_name] = qdrant_import
+                self._import_params[job.collection_name] = job.import_params
+        if job.import_params != self._import_params[job.collection_name]:
+            raise ValueError(f"Jobs migrating into {job.collection_name} must have the same import_params")
+        return qdrant_import
+
+    def _migrate_batch(
+        self,
+        job: MigrationJob,
+        pinecone_export: PineconeExport,
+        qdrant_import: QdrantImport,
+        batch_ids: List[str],
+        batch_bytes: int,
+    ):
+        try:
+            if job.error is not None:
+                return
+            with self._in_flight:
+                ids, vectors, metadata, sparse_values = pinecone_export.fetch_arrays(batch_ids, job.namespace)
+            if ids:
+                with self._in_flight:
+                    qdrant_import.upsert_fetched_arrays(ids, vectors, metadata, sparse_values, job.namespace)
+            with self._lock:
+                job.upserted += len(ids)
+        except Exception as error:  # pylint: disable=broad-except
+            with self._lock:
+                if job.error is None:
+                    job.error = error
+        finally:
+            self.budget.release(batch_bytes)
@@ -0,0 +1,182 @@
+import json
+from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Any, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from qdrant_tools.vectordb import VectorDatabaseHandler
+
+
+def iter_payloads(path: str) -> Iterator[dict]:
+    """
+    Lazily read payloads, one per vector, from a JSONL or Parquet file.
+
+    Args:
+        path (str): Path of a .jsonl or .parquet file. Parquet files require pyarrow.
+
+    Returns:
+        Iterator[dict]: The payloads in file order.
+
+    Raises:
+        ValueError: If the file extension is not supported.
+    """
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path, "r", encoding="utf-8") as payload_file:
+            for line in payload_file:
+                yield json.loads(line)
+    elif path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+        except ImportError as error:
+            raise ImportError("Reading Parquet payloads requires pyarrow: pip install pyarrow") from error
+        for record_batch in pq.ParquetFile(path).iter_batches():
+            yield from record_batch.to_pylist()
+    else:
+        raise ValueError(f"Unsupported payload file: {path}")
+
+
+class ArrayExport(VectorDatabaseHandler, ABC):
+    """
+    Base class for exporting vectors stored locally as arrays, such as FAISS indexes and NumPy files.
+    Vectors are yielded in batches as NumPy arrays, ready for QdrantImport.upsert_source.
+
+    Args:
+        batch_size (int, optional): Size of batches for processing. Defaults to 1000.
+        payload_path (Optional[str]): JSONL or Parquet file holding one payload per vector, in vector order.
+    """
+
+    def __init__(self, batch_size: int = 1000, payload_path: Optional[str] = None):
+        super().__init__(batch_size)
+        self.payload_path = payload_path
+
+    @property
+    @abstractmethod
+    def dimension(self) -> int:
+        """
+        Dimension of the exported vectors.
+        """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """
+        Number of exported vectors.
+        """
+
+    @abstractmethod
+    def fetch_batch(self, start: int, end: int) -> Tuple[Sequence[Union[int, str]], np.ndarray]:
+        """
+        Fetch the vectors stored at positions start to end.
+
+        Args:
+            start (int): Position of the first vector.
+            end (int): Position after the last vector.
+
+        Returns:
+            Tuple[Sequence[Union[int, str]], np.ndarray]: The point ids and a float32 array of the vectors.
+        """
+
+    def iter_batches(self) -> Iterator[Tuple[Sequence[Union[int, str]], np.ndarray, Optional[List[dict]]]]:
+        """
+        Iterate over all vectors in batches of batch_size.
+
+        Returns:
+            Iterator[Tuple[Sequence[Union[int, str]], np.ndarray, Optional[List[dict]]]]: The ids, vectors and
+            payloads of each batch. Payloads are None when no payload_path is set.
+
+        Raises:
+            ValueError: If the payload file has fewer rows than there are vectors.
+        """
+        payloads = iter_payloads(self.payload_path) if self.payload_path is not None else None
+        for start in range(0, len(self), self.batch_size):
+            end = min(start + self.batch_size, len(self))
+            ids, vectors = self.fetch_batch(start, end)
+            batch_payloads = None
+            if payloads is not None:
+                batch_payloads = list(islice(payloads, end - start))
+                if len(batch_payloads) != end - start:
+                    raise ValueError(f"{self.payload_path} has fewer payloads than there are vectors")
+            yield ids, vectors, batch_payloads
+
+
+class FaissExport(ArrayExport):
+    """
+    Class to handle exporting vectors from a FAISS index, reconstructing them in bulk with reconstruct_n.
+    Inverted file indexes need a direct map, see index.make_direct_map().
+
+    Args:
+        index (Union[str, faiss.Index]): A FAISS index or the path of a saved index.
+        batch_size (int, optional): Size of batches for processing. Defaults to 1000.
+        payload_path (Optional[str]): JSONL or Parquet file holding one payload per vector, in vector order.
+    """
+
+    def __init__(self, index: Union[str, Any], batch_size: int = 1000, payload_path: Optional[str] = None):
+        super().__init__(batch_size, payload_path)
+        try:
+            import faiss  # pylint: disable=import-outside-toplevel
+        except ImportError as error:
+            raise ImportError("Exporting FAISS indexes requires faiss: pip install faiss-cpu") from error
+        if isinstance(index, str):
+            index = faiss.read_index(index)
+        # IndexIDMap keeps the user ids next to an index that only knows positions. The wrapper owns the
+        # inner index, so it is kept referenced for as long as the inner index is used.
+        self.faiss_index = index
+        if hasattr(index, "id_map"):
+            self.ids = faiss.vector_to_array(index.id_map)
+            self.index = faiss.downcast_index(index.index)
+        else:
+            self.ids = None
+            self.index = index
+
+    @property
+    def dimension(self) -> int:
+        return self.index.d
+
+    def __len__(self) -> int:
+        return self.index.ntotal
+
+    def fetch_batch(self, start: int, end: int) -> Tuple[Sequence[Union[int, str]], np.ndarray]:
+        ids = self.ids[start:end] if self.ids is not None else np.arange(start, end)
+        return ids, self.index.reconstruct_n(start, end - start)
+
+
+class NumpyExport(ArrayExport):
+    """
+    Class to handle exporting vectors from a 2D .npy file. The file is memory-mapped, so only the
+    current batch is read into memory.
+
+    Args:
+        path (str): Path of the .npy file.
+        ids (Optional[Sequence[Union[int, str]]]): Point ids, one per row. Defaults to the row numbers.
+        batch_size (int, optional): Size of batches for processing. Defaults to 1000.
+        payload_path (Optional[str]): JSONL or Parquet file holding one payload per row, in row order.
+
+    Raises:
+        ValueError: If the array is not 2D or the number of ids does not match the number of rows.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ids: Optional[Sequence[Union[int, str]]] = None,
+        batch_size: int = 1000,
+        payload_path: Optional[str] = None,
+    ):
+        super().__init__(batch_size, payload_path)
+        self.vectors = np.load(path, mmap_mode="r")
+        if self.vectors.ndim != 2:
+            raise ValueError(f"Expected a 2D array in {path}, got {self.vectors.ndim} dimensions")
+        if ids is not None and len(ids) != len(self.vectors):
+            raise ValueError(f"Got {len(ids)} ids for {len(self.vectors)} vectors")
+        self.ids = ids
+
+    @property
+    def dimension(self) -> int:
+        return self.vectors.shape[1]
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    def fetch_batch(self, start: int, end: int) -> Tuple[Sequence[Union[int, str]], np.ndarray]:
+        ids = self.ids[start:end] if self.ids is not None else np.arange(start, end)
+        return ids, np.asarray(self.vectors[start:end], dtype=np.float32)
@@ -0,0 +1,200 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Union
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+from qdrant_client.http.models import PointStruct
+
+from qdrant_tools.vectordb import QdrantImport
+
+
+class CopyCheckpoint:
+    """
+    Class to persist the progress of a collection copy, so an interrupted copy can be resumed.
+
+    Args:
+        path (Optional[str]): Path of the JSON checkpoint file. If None, progress is kept in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.state = {"offset": None, "copied": 0, "done": False, "created": False}
+        if path is not None and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as checkpoint_file:
+                self.state.update(json.load(checkpoint_file))
+
+    @property
+    def started(self) -> bool:
+        """
+        Whether a previous run already created the target collection.
+        """
+        return self.state["created"] or self.state["copied"] > 0 or self.state["done"]
+
+    def mark_created(self):
+        """
+        Record that the target collection and its payload indexes have been created.
+        """
+        self.state["created"] = True
+        self._write()
+
+    def save(self, offset: Optional[Union[int, str]], copied: int):
+        """
+        Record that every point before the given scroll offset has been copied.
+
+        Args:
+            offset (Optional[Union[int, str]]): The scroll offset to resume from, None once the source is exhausted.
+            copied (int): The total number of points copied so far.
+        """
+        self.state = {"offset": offset, "copied": copied, "done": offset is None, "created": True}
+        self._write()
+
+    def _write(self):
+        if self.path is None:
+            return
+        # Write to a temporary file first so a crash never leaves a truncated checkpoint behind
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as checkpoint_file:
+            json.dump(self.state, checkpoint_file)
+        os.replace(tmp_path, self.path)
+
+
+def _merge_config_diff(diff_type: type, source_config: Any, override: Any) -> Any:
+    # Start from the source settings and apply the fields the caller set, e.g. only m of an HnswConfigDiff
+    merged = {key: value for key, value in vars(source_config).items() if value is not None}
+    if isinstance(override, diff_type):
+        merged.update({key: value for key, value in vars(override).items() if value is not None})
+    elif override is not None:
+        return override
+    return diff_type(**merged)
+
+
+def copy_collection(
+    source_collection: str,
+    target_collection: str,
+    source_client: QdrantClient,
+    target_client: Optional[QdrantClient] = None,
+    vectors_config: Optional[Union[models.VectorParams, Dict[str, models.VectorParams]]] = None,
+    batch_size: int = 256,
+    max_workers: int = 4,
+    checkpoint_path: Optional[str] = None,
+    **collection_params: Any,
+) -> int:
+    """
+    Copies every point of a Qdrant collection into a new collection, e.g. to change its shard count,
+    replication factor, quantization or HNSW settings. The target collection takes the HNSW, optimizer,
+    quantization, on-disk payload and sparse vectors configuration of the source collection unless
+    collection_params overrides them, and the payload indexes of the source collection are recreated on it.
+
+    Points are read with scroll in pages of batch_size and upserted concurrently through a QdrantImport
+    for the target collection. The checkpoint only advances past a page once it and every page before it
+    have been upserted, so rerunning with the same checkpoint_path resumes without losing points.
+
+    Args:
+        source_collection (str): Name of the collection to copy from.
+        target_collection (str): Name of the collection to create and copy into.
+        source_client (QdrantClient): Client connected to the source Qdrant instance.
+        target_client (Optional[QdrantClient]): Client connected to the target Qdrant instance.
+        Defaults to source_client.
+        vectors_config (Optional[Union[VectorParams, Dict[str, VectorParams]]]): Vector configuration of the
+        target collection. Defaults to the vector configuration of the source collection.
+        batch_size (int): Number of points per scroll page and upsert request. Defaults to 256.
+        max_workers (int): Number of concurrent upsert requests. Defaults to 4.
+        checkpoint_path (Optional[str]): Path of a JSON file used to record and resume progress.
+        **collection_params: Parameters of the target collection forwarded to QdrantImport.create_collection,
+        e.g. shard_number, replication_factor, hnsw_config or quantization_config. The fields set in an
+        hnsw_config or optimizers_config diff are applied on top of the source configuration.
+
+    Returns:
+        int: The total number of points copied into the target collection.
+
+    Raises:
+        ValueError: If the source and target collection are the same collection, or the target collection
+        already exists and no copy is being resumed.
+    """
+    if target_client is None:
+        target_client = source_client
+    if target_client is source_client and source_collection == target_collection:
+        raise ValueError("Source and target collection must differ")
+
+    source_info = source_client.get_collection(source_collection)
+    if vectors_config is None:
+        vectors_config = source_info.config.params.vectors
+    dimension = vectors_config.size if isinstance(vectors_config, models.VectorParams) else None
+    source_config = source_info.config
+    # Sparse vectors need qdrant-client 1.7 or later, older clients have no such configuration
+    sparse_vectors_config = getattr(source_config.params, "sparse_vectors", None)
+    if sparse_vectors_config:
+        collection_params.setdefault("sparse_vectors_config", sparse_vectors_config)
+    collection_params["hnsw_config"] = _merge_config_diff(
+        models.HnswConfigDiff, source_config.hnsw_config, collection_params.get("hnsw_config")
+    )
+    collection_params["optimizers_config"] = _merge_config_diff(
+        models.OptimizersConfigDiff, source_config.optimizer_config, collection_params.get("optimizers_config")
+    )
+    if source_config.quantization_config is not None:
+        collection_params.setdefault("quantization_config", source_config.quantization_config)
+    collection_params.setdefault("on_disk_payload", source_config.params.on_disk_payload)
+
+    qdrant_import = QdrantImport(
+        ids=[],
+        index_name=target_collection,
+        index_dimension=dimension,
+        points={},
+        qdrant_client=target_client,
+        batch_size=batch_size,
+    )
+    checkpoint = CopyCheckpoint(checkpoint_path)
+    if checkpoint.state["done"]:
+        return checkpoint.state["copied"]
+    if not checkpoint.started:
+        # Two clients may point at the same instance, so never recreate an existing collection, which could
+        # be the source itself
+        existing = {collection.name for collection in target_client.get_collections().collections}
+        if target_collection in existing:
+            raise ValueError(f"Target collection {target_collection} already exists")
+        qdrant_import.create_collection(vectors_config=vectors_config, **collection_params)
+        for field_name, index_info in (source_info.payload_schema or {}).items():
+            target_client.create_payload_index(
+                collection_name=target_collection,
+                field_name=field_name,
+                field_schema=index_info.params or index_info.data_type,
+            )
+        checkpoint.mark_created()
+
+    offset = checkpoint.state["offset"]
+    copied = checkpoint.state["copied"]
+    pending = deque()
+
+    def complete_oldest():
+        nonlocal copied
+        future, next_offset, count = pending.popleft()
+        future.result()
+        copied += count
+        checkpoint.save(next_offset, copied)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            records, next_offset = source_client.scroll(
+                collection_name=source_collection,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            points = [PointStruct(id=record.id, vector=record.vector, payload=record.payload) for record in records]
+            if points:
+                pending.append((executor.submit(qdrant_import.upsert_points, points), next_offset, len(points)))
+            # Bound the number of pages held in memory while upserts are in flight
+            while len(pending) > max_workers or (pending and pending[0][0].done()):
+                complete_oldest()
+            if next_offset is None:
+                break
+            offset = next_offset
+        while pending:
+            complete_oldest()
+
+    checkpoint.save(None, copied)
+    return copied
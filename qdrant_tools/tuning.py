@@ -0,0 +1,403 @@
+import itertools
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+from qdrant_client.http.models import Distance
+
+from qdrant_tools.vectordb import QdrantImport
+
+
+@dataclass
+class TuningCandidate:
+    """
+    A collection and search configuration to evaluate.
+
+    Args:
+        m (int): Number of edges per node of the HNSW graph.
+        ef_construct (int): Size of the candidate list while building the HNSW graph.
+        hnsw_ef (int): Size of the candidate list while searching.
+        quantized (bool): Whether vectors are int8 scalar quantized in RAM, with the originals on disk.
+        rescore (bool): Whether results found with quantized vectors are rescored with the originals.
+    """
+
+    m: int
+    ef_construct: int
+    hnsw_ef: int
+    quantized: bool = False
+    rescore: bool = True
+
+    def collection_params(self) -> Dict[str, Any]:
+        """
+        Settings to pass to QdrantImport.create_collection for this candidate.
+
+        Quantized candidates match QdrantImport(datatype="uint8"), which also keeps the original vectors on disk.
+
+        Returns:
+            Dict[str, Any]: The hnsw_config and, for quantized candidates, the quantization_config arguments.
+        """
+        params = {"hnsw_config": models.HnswConfigDiff(m=self.m, ef_construct=self.ef_construct)}
+        if self.quantized:
+            params["quantization_config"] = models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, always_ram=True)
+            )
+        return params
+
+    def search_params(self) -> models.SearchParams:
+        """
+        Search parameters to query the collection with for this candidate.
+
+        Returns:
+            SearchParams: The hnsw_ef and quantization search parameters.
+        """
+        quantization = models.QuantizationSearchParams(rescore=self.rescore) if self.quantized else None
+        return models.SearchParams(hnsw_ef=self.hnsw_ef, quantization=quantization)
+
+
+@dataclass
+class TuningResult:
+    """
+    Measured quality and cost of a candidate.
+
+    Args:
+        candidate (TuningCandidate): The evaluated configuration.
+        recall (float): Mean fraction of the exact top results that the search returned.
+        p50_ms (float): Median search latency in milliseconds.
+        p95_ms (float): 95th percentile search latency in milliseconds.
+        ram_bytes (int): Predicted RAM of the vectors and HNSW graph for the full collection.
+        build_seconds (float): Time to upsert and index the sample.
+    """
+
+    candidate: TuningCandidate
+    recall: float
+    p50_ms: float
+    p95_ms: float
+    ram_bytes: int
+    build_seconds: float
+
+
+def sample_collection(
+    qdrant_client: QdrantClient,
+    collection_name: str,
+    sample_size: int = 10000,
+    query_count: int = 100,
+    seed: int = 0,
+    vector_name: Optional[str] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Read a uniform random sample of a migrated collection to tune on. The queries are held out from the
+    sampled vectors.
+
+    Point ids are often ordered by time or tenant, so the ids of the whole collection are scrolled without
+    vectors and reservoir sampled, and only the vectors of the sampled points are retrieved.
+
+    Args:
+        qdrant_client (QdrantClient): Client connected to the Qdrant instance holding the collection.
+        collection_name (str): Name of the migrated collection.
+        sample_size (int): Number of vectors to index for each candidate. Defaults to 10000.
+        query_count (int): Number of vectors to use as queries. Defaults to 100.
+        seed (int): Seed of the random sample. Defaults to 0.
+        vector_name (Optional[str]): Name of the dense vector to sample in collections with named vectors, e.g.
+        the dense_vector_name of a hybrid QdrantImport. Defaults to the only named vector of the collection.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The sampled vectors and the query vectors, one per row.
+
+    Raises:
+        ValueError: If the collection has several named vectors and vector_name is not given.
+    """
+    vectors_config = qdrant_client.get_collection(collection_name).config.params.vectors
+    if isinstance(vectors_config, dict) and vector_name is None:
+        if len(vectors_config) != 1:
+            raise ValueError(f"Collection {collection_name} has several named vectors, choose one with vector_name")
+        vector_name = next(iter(vectors_config))
+    rng = np.random.default_rng(seed)
+    target = sample_size + query_count
+    sampled_ids, seen, offset = [], 0, None
+    while True:
+        page, offset = qdrant_client.scroll(
+            collection_name=collection_name,
+            limit=10000,
+            offset=offset,
+            with_payload=False,
+            with_vectors=False,
+        )
+        for point in page:
+            if len(sampled_ids) < target:
+                sampled_ids.append(point.id)
+            else:
+                position = rng.integers(0, seen + 1)
+                if position < target:
+                    sampled_ids[position] = point.id
+            seen += 1
+        if offset is None:
+            break
+    # The first ids of the reservoir keep their scroll order, so shuffle before splitting off the queries
+    rng.shuffle(sampled_ids)
+    vectors_by_id = {}
+    for i in range(0, len(sampled_ids), 1000):
+        points = qdrant_client.retrieve(
+            collection_name=collection_name,
+            ids=sampled_ids[i : i + 1000],
+            with_payload=False,
+            with_vectors=[vector_name] if vector_name is not None else True,
+        )
+        vectors_by_id.update(
+            (point.id, point.vector[vector_name] if vector_name is not None else point.vector) for point in points
+        )
+    # retrieve may return points in id order, so the vectors are put back in the shuffled order, skipping
+    # points deleted since the scroll
+    vectors = np.asarray(
+        [vectors_by_id[point_id] for point_id in sampled_ids if point_id in vectors_by_id], dtype=np.float32
+    )
+    return vectors[query_count:], vectors[:query_count]
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, limit: int, distance: Distance) -> np.ndarray:
+    """
+    Brute-force the positions of the nearest vectors of every query.
+
+    Args:
+        vectors (np.ndarray): The indexed vectors, one per row.
+        queries (np.ndarray): The query vectors, one per row.
+        limit (int): Number of neighbours per query.
+        distance (Distance): The distance metric of the collection.
+
+    Returns:
+        np.ndarray: The positions of the neighbours of each query, one row per query.
+    """
+    if distance == Distance.EUCLID:
+        scores = -(np.sum(queries**2, axis=1, keepdims=True) - 2 * queries @ vectors.T + np.sum(vectors**2, axis=1))
+    else:
+        if distance == Distance.COSINE:
+            vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+            queries = queries / np.linalg.norm(queries, axis=1, keepdims=True).clip(min=1e-12)
+        scores = queries @ vectors.T
+    limit = min(limit, vectors.shape[0])
+    top = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+def candidate_grid(
+    m_values: Sequence[int] = (8, 16, 32),
+    ef_construct_values: Sequence[int] = (64, 128, 256),
+    hnsw_ef_values: Sequence[int] = (32, 64, 128, 256),
+    quantization: bool = True,
+) -> List[TuningCandidate]:
+    """
+    Build every combination of the given settings.
+
+    Args:
+        m_values (Sequence[int]): Values of m to try. Defaults to (8, 16, 32).
+        ef_construct_values (Sequence[int]): Values of ef_construct to try. Defaults to (64, 128, 256).
+        hnsw_ef_values (Sequence[int]): Values of hnsw_ef to try. Defaults to (32, 64, 128, 256).
+        quantization (bool): Whether to also try int8 scalar quantization, with and without rescoring.
+        Defaults to True.
+
+    Returns:
+        List[TuningCandidate]: The candidates.
+    """
+    variants = [(False, True)] + ([(True, False), (True, True)] if quantization else [])
+    return [
+        TuningCandidate(m, ef_construct, hnsw_ef, quantized, rescore)
+        for m, ef_construct, (quantized, rescore), hnsw_ef in itertools.product(
+            m_values, ef_construct_values, variants, hnsw_ef_values
+        )
+    ]
+
+
+def predict_ram_bytes(candidate: TuningCandidate, total_vectors: int, dimension: int) -> int:
+    """
+    Predict the RAM used by the vectors and HNSW graph of a collection.
+
+    Args:
+        candidate (TuningCandidate): The configuration of the collection.
+        total_vectors (int): Number of vectors in the collection.
+        dimension (int): Dimension of the vectors.
+
+    Returns:
+        int: The predicted number of bytes.
+    """
+    bytes_per_dim = 1 if candidate.quantized else 4
+    # Level 0 of the graph stores up to 2 * m links of 4 bytes per point
+    return total_vectors * (dimension * bytes_per_dim + 2 * candidate.m * 4)
+
+
+def _wait_for_indexing(qdrant_client: QdrantClient, collection_name: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while qdrant_client.get_collection(collection_name).status != models.CollectionStatus.GREEN:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Collection {collection_name} was not indexed within {timeout} seconds")
+        time.sleep(0.1)
+
+
+def tune_collection(
+    qdrant_client: QdrantClient,
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    candidates: Optional[List[TuningCandidate]] = None,
+    distance: Distance = Distance.COSINE,
+    limit: int = 10,
+    total_vectors: Optional[int] = None,
+    collection_name: str = "tuning",
+    batch_size: int = 1024,
+    index_timeout: float = 600,
+) -> List[TuningResult]:
+    """
+    Measure recall, latency and memory of candidate configurations on a sample of the data.
+
+    A temporary collection is built for every distinct m, ef_construct and quantization, forced to build its
+    HNSW graph, and searched with every hnsw_ef and rescore setting. Recall is measured against an exact
+    brute-force search. The local mode of QdrantClient always searches exhaustively, so use a Qdrant server,
+    e.g. one started locally with docker, for meaningful results.
+
+    Args:
+        qdrant_client (QdrantClient): Client connected to the Qdrant instance to tune on.
+        vectors (np.ndarray): The sample vectors to index, one per row, see sample_collection.
+        queries (np.ndarray): The query vectors, one per row.
+        candidates (Optional[List[TuningCandidate]]): The configurations to evaluate. Defaults to candidate_grid().
+        distance (Distance): The distance metric. Defaults to COSINE.
+        limit (int): Number of results per query recall is measured on. Defaults to 10.
+        total_vectors (Optional[int]): Size of the full collection, used to predict its RAM. Defaults to the
+        sample size.
+        collection_name (str): Prefix of the temporary collections, which also get a unique suffix per run.
+        Defaults to "tuning".
+        batch_size (int): Number of vectors per upsert. Defaults to 1024.
+        index_timeout (float): Seconds to wait for a collection to be indexed. Defaults to 600.
+
+    Returns:
+        List[TuningResult]: The result of every candidate.
+
+    Raises:
+        TimeoutError: If a collection is not indexed within index_timeout.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    candidates = candidates if candidates is not None else candidate_grid()
+    total_vectors = total_vectors or len(vectors)
+    expected = exact_neighbours(vectors, queries, limit, distance)
+
+    builds = {}
+    for candidate in candidates:
+        builds.setdefault((candidate.m, candidate.ef_construct, candidate.quantized), []).append(candidate)
+
+    # A unique suffix, so tuning never recreates and deletes an existing collection
+    run_id = uuid.uuid4().hex[:12]
+    results = []
+    for (m, ef_construct, quantized), build_candidates in builds.items():
+        name = f"{collection_name}-{run_id}-m{m}-ef{ef_construct}{'-int8' if quantized else ''}"
+        qdrant_import = QdrantImport(
+            ids=[], index_name=name, index_dimension=vectors.shape[1], points={}, qdrant_client=qdrant_client
+        )
+        start = time.perf_counter()
+        collection_params = build_candidates[0].collection_params()
+        qdrant_import.create_collection(
+            vectors_config=models.VectorParams(size=vectors.shape[1], distance=distance, on_disk=quantized or None),
+            # A full_scan_threshold and indexing_threshold of 1 KB build the graph even for small samples
+            hnsw_config=models.HnswConfigDiff(m=m, ef_construct=ef_construct, full_scan_threshold=1),
+            optimizers_config=models.OptimizersConfigDiff(indexing_threshold=1),
+            quantization_config=collection_params.get("quantization_config"),
+        )
+        try:
+            for i in range(0, len(vectors), batch_size):
+                qdrant_import.upsert_arrays(
+                    np.arange(i, min(i + batch_size, len(vectors))), vectors[i : i + batch_size]
+                )
+            _wait_for_indexing(qdrant_client, name, index_timeout)
+            build_seconds = time.perf_counter() - start
+            for candidate in build_candidates:
+                recall, seconds = 0.0, []
+                for query, neighbours in zip(queries, expected):
+                    query_start = time.perf_counter()
+                    found = qdrant_client.search(
+                        collection_name=name,
+                        query_vector=query.tolist(),
+                        search_params=candidate.search_params(),
+                        limit=limit,
+                        with_payload=False,
+                    )
+                    seconds.append(time.perf_counter() - query_start)
+                    recall += len({point.id for point in found} & set(neighbours.tolist())) / len(neighbours)
+                results.append(
+                    TuningResult(
+                        candidate=candidate,
+                        recall=recall / len(queries),
+                        p50_ms=float(np.percentile(seconds, 50)) * 1000,
+                        p95_ms=float(np.percentile(seconds, 95)) * 1000,
+                        ram_bytes=predict_ram_bytes(candidate, total_vectors, vectors.shape[1]),
+                        build_seconds=build_seconds,
+                    )
+                )
+        finally:
+            qdrant_client.delete_collection(name)
+    return results
+
+
+def pareto_front(results: List[TuningResult]) -> List[TuningResult]:
+    """
+    Keep the results that no other result beats on recall, p95 latency and RAM at once.
+
+    Args:
+        results (List[TuningResult]): The results of tune_collection.
+
+    Returns:
+        List[TuningResult]: The Pareto optimal results, by decreasing recall.
+    """
+
+    def dominates(other: TuningResult, result: TuningResult) -> bool:
+        no_worse = (
+            other.recall >= result.recall and other.p95_ms <= result.p95_ms and other.ram_bytes <= result.ram_bytes
+        )
+        better = other.recall > result.recall or other.p95_ms < result.p95_ms or other.ram_bytes < result.ram_bytes
+        return no_worse and better
+
+    front = [result for result in results if not any(dominates(other, result) for other in results)]
+    return sorted(front, key=lambda result: (-result.recall, result.p95_ms))
+
+
+def format_pareto_table(results: List[TuningResult]) -> str:
+    """
+    Render results as a text table, marking the Pareto optimal rows with an asterisk.
+
+    Args:
+        results (List[TuningResult]): The results of tune_collection.
+
+    Returns:
+        str: The table, by decreasing recall.
+    """
+    front = {id(result) for result in pareto_front(results)}
+    lines = [
+        f"{'':1} {'m':>3} {'ef_constr':>9} {'hnsw_ef':>7} {'quant':>5} {'rescore':>7} "
+        f"{'recall':>6} {'p50 ms':>7} {'p95 ms':>7} {'RAM MB':>9}"
+    ]
+    for result in sorted(results, key=lambda result: (-result.recall, result.p95_ms)):
+        candidate = result.candidate
+        lines.append(
+            f"{'*' if id(result) in front else '':1} {candidate.m:>3} {candidate.ef_construct:>9} "
+            f"{candidate.hnsw_ef:>7} {'int8' if candidate.quantized else '-':>5} "
+            f"{('yes' if candidate.rescore else 'no') if candidate.quantized else '-':>7} {result.recall:>6.3f} "
+            f"{result.p50_ms:>7.2f} {result.p95_ms:>7.2f} {result.ram_bytes / 1024 / 1024:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def recommend_settings(results: List[TuningResult], target_recall: float = 0.95) -> Optional[TuningResult]:
+    """
+    Pick the fastest result reaching the target recall, preferring less RAM on ties. Use
+    result.candidate.collection_params() for create_collection and result.candidate.search_params() for search.
+
+    Args:
+        results (List[TuningResult]): The results of tune_collection.
+        target_recall (float): Minimum recall. Defaults to 0.95.
+
+    Returns:
+        Optional[TuningResult]: The recommended result, or None if no candidate reaches the target recall.
+    """
+    eligible = [result for result in results if result.recall >= target_recall]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda result: (result.p95_ms, result.ram_bytes))
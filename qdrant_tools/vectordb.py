@@ -1,11 +1,78 @@
 import getpass
 import os
-from typing import Callable, Dict, List, Optional
-
+import threading
+import uuid
+import warnings
+import weakref
+from collections import defaultdict
+from contextlib import nullcontext
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
 import pinecone
+from pinecone.core.exceptions import PineconeException
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 from qdrant_client.http.models import Distance, PointStruct, UpdateStatus
+from qdrant_client.local.qdrant_local import QdrantLocal
+
+from qdrant_tools.profiling import NULL_PROFILER
+
+# Payload keys recording the Pinecone id of points whose point id differs from it and the Pinecone namespace of a point
+ID_PAYLOAD_KEY = "pinecone_id"
+NAMESPACE_PAYLOAD_KEY = "pinecone_namespace"
+
+# Listeners called with the collection name whenever any QdrantImport changes points in that collection, e.g. to
+# invalidate caches. Bound methods are held weakly, so registering does not keep their objects alive.
+_update_listeners: Dict[str, list] = defaultdict(list)
+_update_listeners_lock = threading.Lock()
+
+# The local mode of QdrantClient is not thread-safe, so every import writing through the same local client
+# serializes its writes with the lock of that client
+_local_client_locks = weakref.WeakKeyDictionary()
+_local_client_locks_lock = threading.Lock()
+
+
+def add_update_listener(collection_name: str, listener: Callable[[str], None]):
+    """
+    Register a function called with the collection name whenever any QdrantImport creates the collection,
+    upserts into it or deletes from it.
+
+    Args:
+        collection_name (str): Name of the collection to listen to.
+        listener (Callable[[str], None]): The function to call. Bound methods are referenced weakly.
+    """
+    reference = weakref.WeakMethod(listener) if hasattr(listener, "__self__") else (lambda: listener)
+    with _update_listeners_lock:
+        _update_listeners[collection_name].append(reference)
+
+
+def notify_update(collection_name: str):
+    """
+    Call every listener registered for a collection.
+
+    Args:
+        collection_name (str): Name of the collection whose points changed.
+    """
+    with _update_listeners_lock:
+        references = _update_listeners.get(collection_name, [])
+        listeners = [reference() for reference in references]
+        # Forget the listeners whose objects were garbage collected
+        references[:] = [reference for reference, listener in zip(references, listeners) if listener is not None]
+    for listener in listeners:
+        if listener is not None:
+            listener(collection_name)
+
+
+def _is_unsupported_filter_error(error: PineconeException) -> bool:
+    # Indexes that cannot count with a filter reject the request as invalid, over REST with a 400 status and
+    # over gRPC with an INVALID_ARGUMENT or UNIMPLEMENTED status. Authentication, quota and network errors differ.
+    status = getattr(error, "status", None)
+    if status is not None:
+        return status == 400
+    code = getattr(error.__cause__, "code", None)
+    return callable(code) and getattr(code(), "name", None) in ("INVALID_ARGUMENT", "UNIMPLEMENTED")
 
 
 class APIKeyValidators:
@@ -45,6 +112,8 @@ class VectorDatabaseHandler:
 
     def __init__(self, batch_size: int = 1000):
         self.batch_size = batch_size
+        # Replaced by MigrationProfiler.attach to profile the batches of this handler
+        self.profiler = NULL_PROFILER
 
     def process_in_batches(self, ids: List[str], processing_function: Callable[[List[str]], None]):
         """
@@ -70,17 +139,32 @@ class PineconeExport(VectorDatabaseHandler):
         Args:
             index_name (str): The name of the Pinecone index to export from.
             batch_size (int, optional): Size of batches for processing. Defaults to 1000.
+            transport (str, optional): Client used to talk to the index, 'rest' or 'grpc'. The gRPC client
+            receives vectors as packed floats instead of JSON and requires pinecone-client[grpc].
+            Defaults to 'rest'.
+
+        Raises:
+            ValueError: If the transport is not supported.
+            ImportError: If the gRPC transport is requested without the gRPC extras installed.
     """
 
-    def __init__(self, index_name: str, batch_size: int = 1000):
+    def __init__(self, index_name: str, batch_size: int = 1000, transport: str = "rest"):
         super().__init__(batch_size)
+        if transport not in ("rest", "grpc"):
+            raise ValueError(f"Unsupported transport: {transport}")
+        if transport == "grpc" and not hasattr(pinecone, "GRPCIndex"):
+            raise ImportError('The grpc transport requires the gRPC extras: pip install "pinecone-client[grpc]"')
         pinecone_keys = ["PINECONE_API_KEY", "PINECONE_ENVIRONMENT"]
         pinecone_api_keys = APIKeyValidators(pinecone_keys)
         self.api_key = pinecone_api_keys.get_key("PINECONE_API_KEY")
         self.environment = pinecone_api_keys.get_key("PINECONE_ENVIRONMENT")
         pinecone.init(api_key=self.api_key, environment=self.environment)
-        self.index = pinecone.Index(index_name=index_name)
+        if transport == "grpc":
+            self.index = pinecone.GRPCIndex(index_name)
+        else:
+            self.index = pinecone.Index(index_name=index_name)
         self.index_name = index_name
+        self.transport = transport
 
     def fetch_vectors(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, dict]:
         """
@@ -88,22 +172,228 @@ class PineconeExport(VectorDatabaseHandler):
 
         Args:
             ids (List[str]): The ids of the vectors to fetch.
+            namespace (Optional[str]): The namespace to fetch from.
 
         Returns:
-            Dict[str, dict]: A dictionary with the fetched vectors, the dimension of the index, and the index name.
+            Dict[str, dict]: A dictionary with the fetched vectors, the dimension of the index, the index name
+            and the namespace.
         """
         fetched_vectors = {}
-        self.process_in_batches(
-            ids,
-            lambda batch_ids: fetched_vectors.update(self.index.fetch(ids=batch_ids, namespace=namespace)["vectors"]),
-        )
+
+        def fetch_batch(batch_ids: List[str]):
+            with self.profiler.stage("fetch"):
+                fetched_vectors.update(self.index.fetch(ids=batch_ids, namespace=namespace)["vectors"])
+
+        self.process_in_batches(ids, fetch_batch)
         return {
             "ids": ids,
             "points": fetched_vectors,
             "index_dimension": self.index.describe_index_stats()["dimension"],
             "index_name": self.index_name,
+            "namespace": namespace,
         }
 
+    def fetch_arrays(
+        self, batch_ids: List[str], namespace: Optional[str] = None
+    ) -> Tuple[List[str], np.ndarray, List[dict], List[Optional[dict]]]:
+        """
+        Fetch a batch of vectors from the Pinecone index as a NumPy array.
+
+        With the gRPC transport the packed floats of the response are copied straight into the array,
+        skipping the conversion of every vector into Python lists.
+
+        Args:
+            batch_ids (List[str]): The ids of the vectors to fetch.
+            namespace (Optional[str]): The namespace to fetch from.
+
+        Returns:
+            Tuple[List[str], np.ndarray, List[dict], List[Optional[dict]]]: The ids of the vectors found, a float32
+            array of their values, one per row, their metadata and their sparse values, None for vectors without
+            sparse values.
+        """
+        with self.profiler.stage("fetch"):
+            if self.transport == "grpc":
+                # pylint: disable=import-outside-toplevel,protected-access
+                from google.protobuf import json_format
+                from pinecone.core.grpc.protos.vector_service_pb2 import FetchRequest
+
+                # GRPCIndex.fetch turns the whole response into dicts, so the stub is called directly
+                request = FetchRequest(ids=batch_ids, namespace=namespace or "")
+                response = self.index._wrap_grpc_call(self.index.stub.Fetch, request)
+                vectors = list(response.vectors.values())
+                ids = [vec.id for vec in vectors]
+                values = np.fromiter(chain.from_iterable(vec.values for vec in vectors), dtype=np.float32)
+                metadata = [
+                    json_format.MessageToDict(vec.metadata) if vec.HasField("metadata") else {} for vec in vectors
+                ]
+                sparse_values = [
+                    (
+                        {"indices": list(vec.sparse_values.indices), "values": list(vec.sparse_values.values)}
+                        if vec.HasField("sparse_values")
+                        else None
+                    )
+                    for vec in vectors
+                ]
+            else:
+                vectors = self.index.fetch(ids=batch_ids, namespace=namespace)["vectors"]
+                ids = list(vectors)
+                values = np.asarray([vectors[vector_id]["values"] for vector_id in ids], dtype=np.float32)
+                metadata = [vectors[vector_id].get("metadata") or {} for vector_id in ids]
+                sparse_values = [vectors[vector_id].get("sparse_values") for vector_id in ids]
+            return ids, values.reshape(len(ids), -1) if ids else values.reshape(0, 0), metadata, sparse_values
+
+    def iter_arrays(
+        self, ids: List[str], namespace: Optional[str] = None
+    ) -> Iterator[Tuple[List[str], np.ndarray, List[dict], List[Optional[dict]]]]:
+        """
+        Fetch vectors from the Pinecone index in batches of batch_size, see fetch_arrays.
+
+        Args:
+            ids (List[str]): The ids of the vectors to fetch.
+            namespace (Optional[str]): The namespace to fetch from.
+
+        Returns:
+            Iterator[Tuple[List[str], np.ndarray, List[dict], List[Optional[dict]]]]: The ids, vectors, metadata
+            and sparse values of each batch.
+        """
+        for i in range(0, len(ids), self.batch_size):
+            yield self.fetch_arrays(ids[i : i + self.batch_size], namespace)
+
+    def count_filtered(self, pinecone_filter: dict, namespace: Optional[str] = None) -> Optional[int]:
+        """
+        Count the vectors matching a metadata filter with describe_index_stats.
+
+        Args:
+            pinecone_filter (dict): The Pinecone metadata filter.
+            namespace (Optional[str]): The namespace to count in.
+
+        Returns:
+            Optional[int]: The number of matching vectors, or None if the index cannot count with a filter,
+            as is the case for serverless and starter indexes.
+
+        Raises:
+            PineconeException: If the request fails for another reason, e.g. authentication or network errors.
+        """
+        try:
+            stats = self.index.describe_index_stats(filter=pinecone_filter)
+        except PineconeException as error:
+            if not _is_unsupported_filter_error(error):
+                raise
+            return None
+        summary = stats["namespaces"].get(namespace or "")
+        return summary["vector_count"] if summary is not None else 0
+
+    def iter_filtered_ids(
+        self,
+        pinecone_filter: dict,
+        namespace: Optional[str] = None,
+        top_k: int = 1000,
+        max_sweeps: int = 1000,
+        patience: int = 5,
+        seed: int = 0,
+    ) -> Iterator[List[str]]:
+        """
+        Discover the ids of the vectors matching a metadata filter. Pinecone cannot list ids, so the index is
+        swept with filtered queries of top_k matches around random query vectors and their opposites, each
+        sweep yielding the ids not seen before.
+
+        Sweeping stops once the number of vectors counted by count_filtered has been found, a query returns
+        fewer than top_k matches, i.e. every match, or patience sweeps in a row find nothing new.
+
+        Args:
+            pinecone_filter (dict): The Pinecone metadata filter, e.g. {"tenant": "acme"}.
+            namespace (Optional[str]): The namespace to search.
+            top_k (int): Matches per query, at most 10000. Defaults to 1000.
+            max_sweeps (int): Maximum number of queries. Defaults to 1000.
+            patience (int): Number of consecutive queries without new ids after which sweeping stops when the
+            index cannot count the matching vectors. Defaults to 5.
+            seed (int): Seed of the random query vectors. Defaults to 0.
+
+        Returns:
+            Iterator[List[str]]: The new ids found by each sweep.
+        """
+        expected = self.count_filtered(pinecone_filter, namespace)
+        dimension = self.index.describe_index_stats()["dimension"]
+        rng = np.random.default_rng(seed)
+        found, idle_sweeps = set(), 0
+        for sweep in range(max_sweeps):
+            if expected is not None and len(found) >= expected:
+                return
+            if sweep % 2 == 0:
+                query_vector = rng.standard_normal(dimension)
+                query_vector /= np.linalg.norm(query_vector)
+            else:
+                # The opposite direction reaches the vectors furthest from the previous query
+                query_vector = -query_vector
+            matches = self.index.query(
+                vector=query_vector.tolist(),
+                top_k=top_k,
+                filter=pinecone_filter,
+                namespace=namespace,
+                include_values=False,
+                include_metadata=False,
+            )["matches"]
+            new_ids = [match["id"] for match in matches if match["id"] not in found]
+            found.update(new_ids)
+            if new_ids:
+                idle_sweeps = 0
+                yield new_ids
+            else:
+                idle_sweeps += 1
+            if len(matches) < top_k or (expected is None and idle_sweeps >= patience):
+                return
+
+    def export_filtered(
+        self, qdrant_import: "QdrantImport", pinecone_filter: dict, namespace: Optional[str] = None, **sweep_params
+    ) -> int:
+        """
+        Stream the vectors matching a metadata filter into Qdrant, e.g. to move a single tenant, without
+        transferring the rest of the index. Ids are fetched and upserted in batches of batch_size as soon
+        as sweeps discover them. The Qdrant collection must already exist.
+
+        A warning is issued when fewer vectors were moved than count_filtered reported, or, when the index
+        cannot count the matching vectors, that the export may be partial.
+
+        Args:
+            qdrant_import (QdrantImport): The import to upsert the vectors with.
+            pinecone_filter (dict): The Pinecone metadata filter.
+            namespace (Optional[str]): The namespace to export from.
+            **sweep_params: Additional arguments for iter_filtered_ids, e.g. top_k or max_sweeps.
+
+        Returns:
+            int: The number of vectors upserted.
+        """
+
+        def upsert(batch_ids: List[str]) -> int:
+            ids, vectors, metadata, sparse_values = self.fetch_arrays(batch_ids, namespace)
+            if ids:
+                qdrant_import.upsert_fetched_arrays(ids, vectors, metadata, sparse_values, namespace)
+            return len(ids)
+
+        upserted, pending = 0, []
+        for new_ids in self.iter_filtered_ids(pinecone_filter, namespace, **sweep_params):
+            pending.extend(new_ids)
+            while len(pending) >= self.batch_size:
+                upserted += upsert(pending[: self.batch_size])
+                pending = pending[self.batch_size :]
+        if pending:
+            upserted += upsert(pending)
+        expected = self.count_filtered(pinecone_filter, namespace)
+        if expected is None:
+            warnings.warn(
+                f"{self.index_name} cannot count the vectors matching the filter, so the {upserted} vectors "
+                "exported may be a subset of them",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+        elif upserted < expected:
+            warnings.warn(
+                f"Exported {upserted} of the {expected} vectors of {self.index_name} matching the filter",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+        return upserted
+
 
 class QdrantImport(VectorDatabaseHandler):
     """
@@ -116,6 +406,22 @@ class QdrantImport(VectorDatabaseHandler):
         qdrant_client (Optional[QdrantClient]): An instance of QdrantClient.
         If not provided, a new instance is created.
         batch_size (int): Size of batches in which vectors are processed.
+        truncate_dimension (Optional[int]): Keep only the first truncate_dimension values of each vector and
+        re-normalize them, for Matryoshka-style embeddings. Defaults to the full index_dimension.
+        datatype (str): Storage type of the vectors, one of 'float32', 'float16' or 'uint8'. 'float16' needs
+        Qdrant and qdrant-client 1.9 or later. 'uint8' keeps int8 scalar quantized vectors in RAM and the
+        float32 originals on disk. Defaults to 'float32'.
+        uuid_ids (bool): Map non-numeric Pinecone ids to deterministic UUIDs instead of sequential integers,
+        so the same Pinecone id always updates the same point. Defaults to False.
+        namespace (Optional[str]): Pinecone namespace of the vectors, stored in the payload of every point
+        under NAMESPACE_PAYLOAD_KEY. Defaults to None, which stores no namespace.
+        sparse_vector_name (Optional[str]): Name of a sparse vector holding the Pinecone sparse_values of hybrid
+        indexes. The dense values are then stored as the named vector dense_vector_name. Needs Qdrant and
+        qdrant-client 1.7 or later. Defaults to None, which stores unnamed dense vectors only.
+        dense_vector_name (str): Name of the dense vector when sparse_vector_name is set. Defaults to 'dense'.
+
+    Raises:
+        ValueError: If truncate_dimension, datatype or sparse vectors are not supported.
     """
 
     def __init__(
@@ -126,30 +432,88 @@ class QdrantImport(VectorDatabaseHandler):
         points: List,
         qdrant_client: Optional[QdrantClient] = None,
         batch_size: int = 1024,
+        truncate_dimension: Optional[int] = None,
+        datatype: str = "float32",
+        uuid_ids: bool = False,
+        namespace: Optional[str] = None,
+        sparse_vector_name: Optional[str] = None,
+        dense_vector_name: str = "dense",
     ):
         self.upsert_counter = 0
         super().__init__(batch_size)
         self.index_name = index_name
         self.index_dimension = index_dimension
+        if truncate_dimension is not None and not 0 < truncate_dimension <= index_dimension:
+            raise ValueError(f"truncate_dimension must be between 1 and {index_dimension}")
+        if datatype not in ("float32", "float16", "uint8"):
+            raise ValueError(f"Unsupported datatype: {datatype}")
+        if datatype == "float16" and not hasattr(models, "Datatype"):
+            raise ValueError("The float16 datatype requires qdrant-client 1.9 or later")
+        if sparse_vector_name is not None and not hasattr(models, "SparseVectorParams"):
+            raise ValueError("Sparse vectors require qdrant-client 1.7 or later")
+        self.truncate_dimension = truncate_dimension
+        self.datatype = datatype
+        self.uuid_ids = uuid_ids
+        self.namespace = namespace
+        self.sparse_vector_name = sparse_vector_name
+        self.dense_vector_name = dense_vector_name
         if qdrant_client is None:
             self.qdrant_client = QdrantClient(":memory:")
         else:
             self.qdrant_client = qdrant_client
+        if isinstance(getattr(self.qdrant_client, "_client", None), QdrantLocal):
+            with _local_client_locks_lock:
+                self._upsert_lock = _local_client_locks.setdefault(self.qdrant_client, threading.Lock())
+        else:
+            self._upsert_lock = nullcontext()
+        # Point ids may be taken from upsert_counter, so batches converted concurrently assign them in turn
+        self._counter_lock = threading.Lock()
         self.points = points
         self.ids = ids
 
-    def create_collection(self, distance=Distance.COSINE):
+    def create_collection(
+        self,
+        distance=Distance.COSINE,
+        vectors_config: Optional[Union[models.VectorParams, Dict[str, models.VectorParams]]] = None,
+        **collection_params,
+    ):
         """
         Creates a new collection in Qdrant.
 
         Args:
             distance (Distance): The distance metric to be used in the collection.
             Default is COSINE.
+            vectors_config (Optional[Union[VectorParams, Dict[str, VectorParams]]]): Vector configuration to use
+            instead of the one derived from index_dimension, truncate_dimension, datatype and distance.
+            With sparse_vector_name set, it must name the dense vector dense_vector_name.
+            **collection_params: Additional collection parameters forwarded to recreate_collection,
+            e.g. shard_number, replication_factor, hnsw_config or quantization_config.
         """
+        if vectors_config is None:
+            vector_params = {"size": self.truncate_dimension or self.index_dimension, "distance": distance}
+            if self.datatype == "float16":
+                vector_params["datatype"] = models.Datatype.FLOAT16
+            elif self.datatype == "uint8":
+                vector_params["on_disk"] = True
+                collection_params.setdefault(
+                    "quantization_config",
+                    models.ScalarQuantization(
+                        scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, always_ram=True)
+                    ),
+                )
+            vectors_config = models.VectorParams(**vector_params)
+            if self.sparse_vector_name is not None:
+                vectors_config = {self.dense_vector_name: vectors_config}
+        if self.sparse_vector_name is not None:
+            collection_params.setdefault(
+                "sparse_vectors_config", {self.sparse_vector_name: models.SparseVectorParams()}
+            )
         self.qdrant_client.recreate_collection(
             collection_name=self.index_name,
-            vectors_config=models.VectorParams(size=self.index_dimension, distance=distance),
+            vectors_config=vectors_config,
+            **collection_params,
         )
+        self.notify_update()
 
     def upsert_vectors(self):
         """
@@ -171,22 +535,294 @@ class QdrantImport(VectorDatabaseHandler):
             batch_ids (List[str]): The list of vector ids in the current batch.
         """
         points = {id: self.points[id] for id in batch_ids}
-        point_ids = []
-        for idx, vec in enumerate(points.values()):
-            point_id = self.upsert_counter if not str(vec["id"]).isdigit() else int(vec["id"])
-            # Create a PointStruct for each vector
-            # Use 'text' if present in 'metadata', else use the entire 'metadata'
-            payload = (
-                vec["metadata"]
-                if "text" not in vec["metadata"]
-                else {"text": vec["metadata"]["text"], "metadata": vec["metadata"]}
+        self.upsert_points(self.to_points(points.values()))
+
+    def to_points(self, vectors: Iterable[dict], namespace: Optional[str] = None) -> List[PointStruct]:
+        """
+        Converts Pinecone vectors into Qdrant points. Pinecone ids that are not used as point ids, see
+        point_id, are kept in the payload under ID_PAYLOAD_KEY.
+
+        Args:
+            vectors (Iterable[dict]): Pinecone vectors with 'id', 'values', 'metadata' and optionally 'sparse_values'.
+            namespace (Optional[str]): Pinecone namespace of the vectors. Defaults to the namespace of the import.
+
+        Returns:
+            List[PointStruct]: The points to upsert.
+        """
+        with self.profiler.stage("transform"):
+            vectors = list(vectors)
+            values = self.convert_vectors([vec["values"] for vec in vectors])
+            point_ids = []
+            with self._counter_lock:
+                for vec, vector in zip(vectors, values):
+                    point_id = self.point_id(vec["id"], namespace)
+                    # Create a PointStruct for each vector
+                    payload = self.to_payload(vec["id"], vec["metadata"], namespace)
+                    vector = self.point_vector(vector, vec.get("sparse_values"))
+                    point_ids.append(PointStruct(id=point_id, vector=vector, payload=payload))
+                    self.upsert_counter += 1
+            return point_ids
+
+    def point_vector(
+        self, values: List[float], sparse_values: Optional[dict] = None
+    ) -> Union[List[float], Dict[str, Any]]:
+        """
+        Builds the vector of a point, naming the dense and sparse vectors when sparse_vector_name is set.
+
+        Args:
+            values (List[float]): The converted dense values.
+            sparse_values (Optional[dict]): The Pinecone sparse values, with 'indices' and 'values'.
+
+        Returns:
+            Union[List[float], Dict[str, Any]]: The dense values, or the named vectors of a hybrid collection.
+        """
+        if self.sparse_vector_name is None:
+            return values
+        vector = {self.dense_vector_name: values}
+        if sparse_values:
+            vector[self.sparse_vector_name] = models.SparseVector(
+                indices=list(sparse_values["indices"]), values=list(sparse_values["values"])
             )
-            point_ids.append(PointStruct(id=point_id, vector=vec["values"], payload=payload))
-            self.upsert_counter += 1
+        return vector
 
+    def search_vector(self, values: List[float]) -> Union[List[float], models.NamedVector]:
+        """
+        Wraps converted query values for search, naming the dense vector of hybrid collections.
+
+        Args:
+            values (List[float]): The converted query values.
+
+        Returns:
+            Union[List[float], NamedVector]: The query vector.
+        """
+        if self.sparse_vector_name is None:
+            return values
+        return models.NamedVector(name=self.dense_vector_name, vector=values)
+
+    def to_payload(self, vector_id: Union[int, str], metadata: dict, namespace: Optional[str] = None) -> dict:
+        """
+        Builds the payload of a point from the id and metadata of a Pinecone vector.
+
+        Args:
+            vector_id (Union[int, str]): The Pinecone vector id.
+            metadata (dict): The Pinecone metadata of the vector.
+            namespace (Optional[str]): Pinecone namespace of the vector. Defaults to the namespace of the import.
+
+        Returns:
+            dict: The payload.
+        """
+        namespace = self.resolve_namespace(namespace)
+        # Use 'text' if present in 'metadata', else use the entire 'metadata'
+        payload = dict(metadata) if "text" not in metadata else {"text": metadata["text"], "metadata": metadata}
+        if namespace or not str(vector_id).isdigit():
+            payload[ID_PAYLOAD_KEY] = vector_id
+        if namespace:
+            payload[NAMESPACE_PAYLOAD_KEY] = namespace
+        return payload
+
+    def resolve_namespace(self, namespace: Optional[str] = None) -> Optional[str]:
+        """
+        Resolves the Pinecone namespace points are written to and read from.
+
+        Args:
+            namespace (Optional[str]): Pinecone namespace of the vectors. Defaults to the namespace of the import.
+
+        Returns:
+            Optional[str]: The namespace, where "" and None both stand for the default namespace.
+        """
+        return namespace if namespace is not None else self.namespace
+
+    def point_id(self, vector_id: Union[int, str], namespace: Optional[str] = None) -> Union[int, str]:
+        """
+        Maps a Pinecone vector id to a Qdrant point id. Ids are only unique within a Pinecone namespace, so
+        vectors of a namespace get a UUID derived from both the namespace and the id. Otherwise numeric ids
+        are kept, and other ids become a UUID derived from the id if uuid_ids is set, or the current
+        upsert_counter otherwise.
+
+        Args:
+            vector_id (Union[int, str]): The Pinecone vector id.
+            namespace (Optional[str]): Pinecone namespace of the vector. Defaults to the namespace of the import.
+
+        Returns:
+            Union[int, str]: The Qdrant point id.
+        """
+        namespace = self.resolve_namespace(namespace)
+        if namespace:
+            return str(uuid.uuid5(uuid.uuid5(uuid.NAMESPACE_OID, namespace), str(vector_id)))
+        if str(vector_id).isdigit():
+            return int(vector_id)
+        if self.uuid_ids:
+            return str(uuid.uuid5(uuid.NAMESPACE_OID, str(vector_id)))
+        return self.upsert_counter
+
+    def convert_vectors(self, values: List[List[float]]) -> List[List[float]]:
+        """
+        Truncates, re-normalizes and casts a batch of vectors according to truncate_dimension and datatype.
+
+        Args:
+            values (List[List[float]]): The vectors of the batch.
+
+        Returns:
+            List[List[float]]: The converted vectors, or the given vectors if no conversion is configured.
+        """
+        if not values or (self.truncate_dimension is None and self.datatype != "float16"):
+            return values
+        # Convert the whole batch at once rather than vector by vector
+        return self.convert_array(np.asarray(values, dtype=np.float32)).tolist()
+
+    def convert_array(self, array: np.ndarray) -> np.ndarray:
+        """
+        Truncates, re-normalizes and casts a 2D array of vectors according to truncate_dimension and datatype.
+
+        Args:
+            array (np.ndarray): The vectors of the batch, one per row.
+
+        Returns:
+            np.ndarray: The converted vectors.
+        """
+        if self.truncate_dimension is not None:
+            array = array[:, : self.truncate_dimension]
+            norms = np.linalg.norm(array, axis=1, keepdims=True)
+            array = array / np.where(norms == 0, 1, norms)
+        if self.datatype == "float16":
+            array = array.astype(np.float16)
+        return array
+
+    def upsert_arrays(
+        self,
+        ids: Sequence[Union[int, str]],
+        vectors: np.ndarray,
+        payloads: Optional[List[dict]] = None,
+        sparse_values: Optional[List[Optional[dict]]] = None,
+    ):
+        """
+        Upserts a batch of vectors held in a NumPy array as a single columnar batch.
+
+        Args:
+            ids (Sequence[Union[int, str]]): The point ids, one per row of vectors.
+            vectors (np.ndarray): The vectors of the batch, one per row.
+            payloads (Optional[List[dict]]): The payloads, one per row of vectors.
+            sparse_values (Optional[List[Optional[dict]]]): Sparse values with 'indices' and 'values', one per
+            row of vectors. Only stored when sparse_vector_name is set.
+        """
+        if isinstance(ids, np.ndarray):
+            ids = ids.tolist()
+        with self.profiler.stage("transform"):
+            vectors = self.convert_array(np.asarray(vectors, dtype=np.float32)).tolist()
+        self._upsert_converted(ids, vectors, payloads, sparse_values)
+
+    def _upsert_converted(
+        self,
+        ids: Sequence[Union[int, str]],
+        vectors: List[List[float]],
+        payloads: Optional[List[dict]],
+        sparse_values: Optional[List[Optional[dict]]],
+    ):
+        if self.sparse_vector_name is None:
+            self.upsert_points(models.Batch(ids=list(ids), vectors=vectors, payloads=payloads))
+        elif sparse_values is None or not any(sparse_values):
+            self.upsert_points(
+                models.Batch(ids=list(ids), vectors={self.dense_vector_name: vectors}, payloads=payloads)
+            )
+        else:
+            # Sparse vectors cannot be mixed with missing ones in a columnar batch, so send points instead
+            payloads = payloads or [None] * len(vectors)
+            self.upsert_points(
+                [
+                    PointStruct(id=point_id, vector=self.point_vector(vector, sparse), payload=payload)
+                    for point_id, vector, sparse, payload in zip(ids, vectors, sparse_values, payloads)
+                ]
+            )
+
+    def upsert_fetched_arrays(
+        self,
+        ids: List[str],
+        vectors: np.ndarray,
+        metadata: List[dict],
+        sparse_values: Optional[List[Optional[dict]]] = None,
+        namespace: Optional[str] = None,
+    ):
+        """
+        Upserts a batch returned by PineconeExport.fetch_arrays, mapping the Pinecone ids and metadata like
+        to_points does.
+
+        Args:
+            ids (List[str]): The Pinecone vector ids.
+            vectors (np.ndarray): The vectors of the batch, one per row.
+            metadata (List[dict]): The Pinecone metadata, one per row.
+            sparse_values (Optional[List[Optional[dict]]]): The Pinecone sparse values, one per row.
+            namespace (Optional[str]): Pinecone namespace of the vectors. Defaults to the namespace of the import.
+        """
+        with self.profiler.stage("transform"):
+            point_ids, payloads = [], []
+            with self._counter_lock:
+                for vector_id, vec_metadata in zip(ids, metadata):
+                    point_ids.append(self.point_id(vector_id, namespace))
+                    payloads.append(self.to_payload(vector_id, vec_metadata, namespace))
+                    self.upsert_counter += 1
+            vectors = self.convert_array(np.asarray(vectors, dtype=np.float32)).tolist()
+        self._upsert_converted(point_ids, vectors, payloads, sparse_values)
+
+    def upsert_source(self, source) -> int:
+        """
+        Upserts every batch of a local vector source, such as a FaissExport or NumpyExport.
+
+        Args:
+            source: An object whose iter_batches() yields (ids, vectors, payloads) batches.
+
+        Returns:
+            int: The number of points upserted.
+        """
+        upserted = 0
+        for ids, vectors, payloads in source.iter_batches():
+            self.upsert_arrays(ids, vectors, payloads)
+            upserted += len(vectors)
+        return upserted
+
+    def upsert_points(self, points: Union[List[PointStruct], models.Batch]):
+        """
+        Upserts already constructed points into the collection.
+
+        Args:
+            points (Union[List[PointStruct], Batch]): The points to upsert.
+
+        Raises:
+            InterruptedError: If the upsert operation is not completed successfully.
+        """
         # Perform the upsert operation
-        operation_info = self.qdrant_client.upsert(collection_name=self.index_name, wait=True, points=point_ids)
+        try:
+            with self.profiler.stage("upsert"), self._upsert_lock:
+                operation_info = self.qdrant_client.upsert(collection_name=self.index_name, wait=True, points=points)
+        finally:
+            self.notify_update()
 
         # Check if the operation was successful
         if operation_info.status != UpdateStatus.COMPLETED:
             raise InterruptedError("Upsert failed")
+
+    def delete_points(self, points_selector: Union[models.PointIdsList, models.FilterSelector]):
+        """
+        Deletes points from the collection.
+
+        Args:
+            points_selector (Union[PointIdsList, FilterSelector]): The ids or filter of the points to delete.
+
+        Raises:
+            InterruptedError: If the delete operation is not completed successfully.
+        """
+        try:
+            with self._upsert_lock:
+                operation_info = self.qdrant_client.delete(
+                    collection_name=self.index_name, wait=True, points_selector=points_selector
+                )
+        finally:
+            self.notify_update()
+
+        if operation_info.status != UpdateStatus.COMPLETED:
+            raise InterruptedError("Delete failed")
+
+    def notify_update(self):
+        """
+        Calls every listener registered for the collection with add_update_listener.
+        """
+        notify_update(self.index_name)
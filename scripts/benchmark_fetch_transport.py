@@ -0,0 +1,136 @@
+"""
+Benchmark PineconeExport.fetch_arrays over the REST and gRPC transports against local stand-in servers,
+so no Pinecone account is needed. Requires pinecone-client[grpc].
+
+    python scripts/benchmark_fetch_transport.py --vectors 20000 --dimension 1536 --batch-size 1000
+"""
+import argparse
+import json
+import os
+import time
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import parse_qs, urlparse
+
+import grpc
+import numpy as np
+import pinecone
+from google.protobuf import json_format
+from google.protobuf.internal import api_implementation
+from pinecone.core.grpc.protos import vector_service_pb2
+
+from qdrant_tools.vectordb import PineconeExport
+
+INDEX_NAME = "benchmark"
+
+
+def make_vectors(count: int, dimension: int) -> dict:
+    rng = np.random.default_rng(0)
+    values = rng.random((count, dimension), dtype=np.float32)
+    return {
+        str(i): {"id": str(i), "values": values[i].tolist(), "metadata": {"text": f"document {i}", "position": i}}
+        for i in range(count)
+    }
+
+
+def start_grpc_server(vectors: dict) -> grpc.Server:
+    # Responses are assembled from pre-serialized map entries, so the timings measure the client rather than
+    # the stand-in server. Concatenated FetchResponse messages parse as one message with all their vectors.
+    entries = {
+        vector_id: vector_service_pb2.FetchResponse(
+            vectors={vector_id: json_format.ParseDict(vec, vector_service_pb2.Vector())}
+        ).SerializeToString()
+        for vector_id, vec in vectors.items()
+    }
+
+    def fetch(request, context):  # pylint: disable=unused-argument
+        return b"".join(entries[vector_id] for vector_id in request.ids if vector_id in entries)
+
+    handler = grpc.unary_unary_rpc_method_handler(
+        fetch,
+        request_deserializer=vector_service_pb2.FetchRequest.FromString,
+        response_serializer=lambda response: response,
+    )
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=4),
+        options=[("grpc.max_send_message_length", -1), ("grpc.max_receive_message_length", -1)],
+    )
+    server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler("VectorService", {"Fetch": handler}),))
+    server.port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    return server
+
+
+def start_rest_server(vectors: dict) -> ThreadingHTTPServer:
+    entries = {vector_id: json.dumps(vector_id) + ":" + json.dumps(vec) for vector_id, vec in vectors.items()}
+
+    class FetchHandler(BaseHTTPRequestHandler):
+        def do_GET(self):  # pylint: disable=invalid-name
+            query = parse_qs(urlparse(self.path).query)
+            found = ",".join(entries[vector_id] for vector_id in query.get("ids", []) if vector_id in entries)
+            namespace = json.dumps(query.get("namespace", [""])[0])
+            body = f'{{"vectors": {{{found}}}, "namespace": {namespace}}}'.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FetchHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def time_fetch(export: PineconeExport, ids: list) -> float:
+    start = time.perf_counter()
+    fetched = sum(len(batch_ids) for batch_ids, *_ in export.iter_arrays(ids))
+    seconds = time.perf_counter() - start
+    assert fetched == len(ids), f"fetched {fetched} of {len(ids)} vectors"
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Dummy credentials, the project name avoids a lookup against the Pinecone controller
+    os.environ.setdefault("PINECONE_API_KEY", "benchmark")
+    os.environ.setdefault("PINECONE_ENVIRONMENT", "local")
+    os.environ.setdefault("PINECONE_PROJECT_NAME", "local")
+
+    vectors = make_vectors(args.vectors, args.dimension)
+    ids = list(vectors)
+    # The servers stop once garbage collected, so they are kept referenced until the benchmark ends
+    grpc_server = start_grpc_server(vectors)
+    rest_server = start_rest_server(vectors)
+
+    rest_export = PineconeExport(INDEX_NAME, batch_size=args.batch_size, transport="rest")
+    rest_export.index.configuration.host = f"http://127.0.0.1:{rest_server.server_address[1]}"
+    grpc_export = PineconeExport(INDEX_NAME, batch_size=args.batch_size, transport="grpc")
+    grpc_export.index = pinecone.GRPCIndex(
+        INDEX_NAME,
+        channel=grpc.insecure_channel(
+            f"127.0.0.1:{grpc_server.port}", options=[("grpc.max_receive_message_length", -1)]
+        ),
+    )
+
+    print(f"{args.vectors} vectors of dimension {args.dimension}, batches of {args.batch_size}")
+    # The pure Python protobuf implementation decodes several times slower than the native ones
+    print(f"protobuf implementation: {api_implementation.Type()}")
+    for name, export in (("rest", rest_export), ("grpc", grpc_export)):
+        seconds = min(time_fetch(export, ids) for _ in range(args.repeat))
+        print(f"{name:>5}: {seconds:.2f}s, {args.vectors / seconds:,.0f} vectors/s")
+    grpc_server.stop(None)
+    rest_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()